@@ -1,5 +1,8 @@
 """
 ASGI config for classalarm_backend project.
+
+Serve this application (e.g. with uvicorn or daphne) to enable the
+notification stream at /api/classes/notifications/stream/.
 """
 
 import os
@@ -2,8 +2,12 @@
 Django settings for classalarm_backend project.
 """
 
+import tempfile
 from pathlib import Path
+from urllib.parse import urlsplit
+from corsheaders.defaults import default_headers
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +41,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'classalarm_backend.middleware.CompressionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,6 +84,47 @@ if config('DATABASE_URL', default=None):
     import dj_database_url
     DATABASES['default'] = dj_database_url.parse(config('DATABASE_URL'))
 
+# Cache shared by the web workers and the alarm scheduler, so notification
+# inbox versions and cached timetables are seen by every process. CACHE_URL picks
+# the backend:
+#   redis://localhost:6379/0    Redis or a Redis-compatible server (pip install redis)
+#   file:///var/tmp/classalarm  a directory every process can write to
+#   db://classalarm_cache       a database table (run ./manage.py createcachetable)
+#   locmem://                   per-process memory, only for a single process
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+CACHE_URL = config('CACHE_URL', default=f"file://{Path(tempfile.gettempdir()) / 'classalarm_cache'}")
+_cache_url = urlsplit(CACHE_URL)
+if _cache_url.scheme not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"CACHE_URL scheme {_cache_url.scheme!r} is not one of: {', '.join(CACHE_BACKENDS)}"
+    )
+
+# Entries the file, db and locmem caches keep before culling; Django's
+# default of 300 is far below one timetable and inbox version per user
+CACHE_MAX_ENTRIES = config('CACHE_MAX_ENTRIES', default=20000, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[_cache_url.scheme],
+        'LOCATION': {
+            'file': _cache_url.path,
+            'db': _cache_url.netloc,
+            'locmem': _cache_url.netloc,
+        }.get(_cache_url.scheme, CACHE_URL),
+        'KEY_PREFIX': 'classalarm',
+        'TIMEOUT': 300,
+        # Redis evicts by its own maxmemory policy instead
+        'OPTIONS': {} if _cache_url.scheme in ('redis', 'rediss') else {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,6 +169,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'classes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
@@ -163,6 +214,17 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the service worker revalidate cached API responses across origins,
+# and upload clients send and read chunk offsets
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'upload-offset')
+CORS_EXPOSE_HEADERS = ['ETag', 'Upload-Offset']
+
+# Compress responses at least this many bytes long (see
+# classalarm_backend.middleware); Brotli is used when the brotli package is
+# installed and the client accepts it, gzip otherwise
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
@@ -170,6 +232,39 @@ AUTH_USER_MODEL = 'users.User'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Resumable attachment uploads (see classes.upload_service) are assembled
+# here; keep it on the same disk as MEDIA_ROOT so finishing one is a rename
+ATTACHMENT_UPLOAD_DIR = config('ATTACHMENT_UPLOAD_DIR', default=str(BASE_DIR / 'upload_parts'))
+ATTACHMENT_MAX_SIZE = config('ATTACHMENT_MAX_SIZE', default=200 * 1024 * 1024, cast=int)  # 200MB
+
+# How attachment downloads hand their bytes to the front web server: 'nginx'
+# sends X-Accel-Redirect to SENDFILE_URL_PREFIX (an internal location aliased
+# to MEDIA_ROOT), 'xsendfile' sends X-Sendfile (Apache, lighttpd), and ''
+# streams them from Python for local use
+SENDFILE_BACKEND = config('SENDFILE_BACKEND', default='')
+SENDFILE_URL_PREFIX = config('SENDFILE_URL_PREFIX', default='/protected-media/')
+
+# Background tasks (alarm checks, test notifications, attachment previews).
+# The database broker queues them for `python manage.py run_task_worker`; the
+# local broker runs them on threads in the web process, for development
+TASK_BROKER = config(
+    'TASK_BROKER',
+    default='classes.task_queue.LocalBroker' if DEBUG else 'classes.task_queue.DatabaseBroker'
+)
+# Most tasks of each queue running at once, across all workers
+TASK_QUEUE_LIMITS = {
+    'alarms': 1,
+    'notifications': 4,
+    'attachments': 2,
+    'default': 4,
+}
+
+# Students without their own alarm for a class get their default alarm
+# (AlarmPreference, or 20 minutes before). Each default alarm sent writes a
+# delivery row and an inbox row per student, so with many students set this
+# to send defaults only to those who have saved a preference
+ALARM_DEFAULTS_OPT_IN = config('ALARM_DEFAULTS_OPT_IN', default=False, cast=bool)
+
 # Security settings for production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -1,27 +1,38 @@
 from django.contrib import admin
-from .models import ClassSchedule, ClassAttachment, AlarmSettings, NotificationLog
+from django.utils import timezone
+from .models import ClassSchedule, ClassAttachment, ClassCancellation, AttachmentBlob, AttachmentUpload, AlarmSettings, AlarmPreference, AlarmDelivery, NotificationLog, NotificationInbox, Tombstone, Task
 
 
 class ClassAttachmentInline(admin.TabularInline):
     """Inline admin for class attachments."""
     model = ClassAttachment
     extra = 0
-    readonly_fields = ('file_size', 'uploaded_at')
+    readonly_fields = ('file', 'blob', 'file_size', 'uploaded_at')
+
+
+class ClassCancellationInline(admin.TabularInline):
+    """Inline admin for cancelled occurrences of a class."""
+    model = ClassCancellation
+    extra = 0
+    readonly_fields = ('created_at',)
 
 
 @admin.register(ClassSchedule)
 class ClassScheduleAdmin(admin.ModelAdmin):
     """Admin for class schedules."""
-    list_display = ('subject', 'venue', 'date', 'time', 'created_by', 'created_at')
-    list_filter = ('subject', 'venue', 'date', 'created_by', 'created_at')
+    list_display = ('subject', 'venue', 'date', 'time', 'recurrence', 'repeat_until', 'created_by', 'created_at')
+    list_filter = ('subject', 'venue', 'date', 'recurrence', 'created_by', 'created_at')
     search_fields = ('subject', 'venue', 'note', 'created_by__email')
     ordering = ('-created_at',)
-    inlines = [ClassAttachmentInline]
+    inlines = [ClassAttachmentInline, ClassCancellationInline]
     
     fieldsets = (
         ('Class Details', {
             'fields': ('subject', 'venue', 'date', 'time')
         }),
+        ('Repeat', {
+            'fields': ('recurrence', 'repeat_until')
+        }),
         ('Additional Info', {
             'fields': ('note', 'created_by'),
             'classes': ('collapse',)
@@ -45,7 +56,7 @@ class ClassAttachmentAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('File Info', {
-            'fields': ('class_schedule', 'file', 'original_filename', 'file_size')
+            'fields': ('class_schedule', 'file', 'blob', 'original_filename', 'file_size')
         }),
         ('Timestamps', {
             'fields': ('uploaded_at',),
@@ -53,20 +64,21 @@ class ClassAttachmentAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('file_size', 'uploaded_at')
+    # Files are shared by content, so they are only set through uploads
+    readonly_fields = ('file', 'blob', 'file_size', 'uploaded_at')
 
 
 @admin.register(AlarmSettings)
 class AlarmSettingsAdmin(admin.ModelAdmin):
     """Admin for alarm settings."""
-    list_display = ('user', 'class_schedule', 'is_enabled', 'alarm_minutes_before', 'created_at')
+    list_display = ('user', 'class_schedule', 'is_enabled', 'alarm_minutes_before', 'fires_at', 'created_at')
     list_filter = ('is_enabled', 'alarm_minutes_before', 'created_at')
     search_fields = ('user__email', 'class_schedule__subject')
     ordering = ('-created_at',)
     
     fieldsets = (
         ('Alarm Settings', {
-            'fields': ('user', 'class_schedule', 'is_enabled', 'alarm_minutes_before')
+            'fields': ('user', 'class_schedule', 'is_enabled', 'alarm_minutes_before', 'fires_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -74,24 +86,100 @@ class AlarmSettingsAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('fires_at', 'created_at', 'updated_at')
+
+
+@admin.register(AlarmPreference)
+class AlarmPreferenceAdmin(admin.ModelAdmin):
+    """Admin for default alarm preferences."""
+    list_display = ('user', 'is_enabled', 'alarm_minutes_before', 'updated_at')
+    list_filter = ('is_enabled', 'alarm_minutes_before')
+    search_fields = ('user__email',)
+    readonly_fields = ('updated_at',)
 
 
 @admin.register(NotificationLog)
 class NotificationLogAdmin(admin.ModelAdmin):
     """Admin for notification logs."""
-    list_display = ('user', 'class_schedule', 'notification_type', 'sent_at')
+    list_display = ('user', 'class_schedule', 'notification_type', 'sent_at', 'acknowledged_at')
     list_filter = ('notification_type', 'sent_at', 'user')
     search_fields = ('user__email', 'class_schedule__subject', 'message')
     ordering = ('-sent_at',)
-    readonly_fields = ('sent_at',)
+    readonly_fields = ('sent_at', 'acknowledged_at')
     
     fieldsets = (
         ('Notification Info', {
             'fields': ('user', 'class_schedule', 'notification_type', 'message')
         }),
         ('Timestamps', {
-            'fields': ('sent_at',),
+            'fields': ('sent_at', 'acknowledged_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(AlarmDelivery)
+class AlarmDeliveryAdmin(admin.ModelAdmin):
+    """Admin for the alarm delivery ledger."""
+    list_display = ('user', 'class_schedule', 'date', 'claimed_at')
+    list_filter = ('claimed_at',)
+    search_fields = ('user__email', 'class_schedule__subject')
+    ordering = ('-claimed_at',)
+    readonly_fields = ('claim', 'claimed_at')
+
+
+@admin.register(NotificationInbox)
+class NotificationInboxAdmin(admin.ModelAdmin):
+    """Admin for notification inbox cursors."""
+    list_display = ('user', 'cleared_through', 'updated_at')
+    search_fields = ('user__email',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(AttachmentBlob)
+class AttachmentBlobAdmin(admin.ModelAdmin):
+    """Admin for stored attachment content."""
+    list_display = ('sha256', 'size', 'ref_count', 'preview_status', 'created_at')
+    list_filter = ('preview_status',)
+    search_fields = ('sha256',)
+    ordering = ('-created_at',)
+    readonly_fields = (
+        'sha256', 'file', 'size', 'ref_count', 'thumbnail', 'preview', 'preview_status', 'previewed_at', 'created_at'
+    )
+
+
+@admin.register(AttachmentUpload)
+class AttachmentUploadAdmin(admin.ModelAdmin):
+    """Admin for unfinished resumable attachment uploads."""
+    list_display = ('original_filename', 'class_schedule', 'created_by', 'received', 'file_size', 'updated_at')
+    search_fields = ('original_filename', 'created_by__email')
+    ordering = ('-created_at',)
+    readonly_fields = ('id', 'received', 'created_at', 'updated_at')
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    """Admin for sync tombstones."""
+    list_display = ('kind', 'object_id', 'user', 'deleted_at')
+    list_filter = ('kind', 'deleted_at')
+    ordering = ('-deleted_at',)
+    readonly_fields = ('deleted_at',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Admin for background tasks; failed ones stay here with their error."""
+    list_display = ('name', 'queue', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'queue', 'name')
+    ordering = ('run_at',)
+    readonly_fields = ('attempts', 'locked_until', 'unique_key', 'last_error', 'created_at', 'updated_at')
+    actions = ['retry_tasks']
+    
+    @admin.action(description='Retry selected failed tasks')
+    def retry_tasks(self, request, queryset):
+        """Queue failed tasks to run again with a fresh set of attempts."""
+        # Unique tasks are left out; the next request for one queues a new run
+        retried = queryset.filter(status='failed', unique_key__isnull=True).update(
+            status='queued', attempts=0, run_at=timezone.now()
+        )
+        self.message_user(request, f'{retried} tasks queued to run again.')
@@ -0,0 +1,156 @@
+"""
+Content-addressed storage for class attachments.
+"""
+
+import hashlib
+from pathlib import PurePath
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import ClassAttachment, AttachmentBlob
+from .tasks import generate_attachment_previews
+
+
+class AttachmentService:
+    """Service for storing attachment files once per distinct content."""
+    
+    @staticmethod
+    def hash_file(content):
+        """Return the SHA-256 hex digest of a Django File, read a chunk at a time."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def blob_name(digest, original_filename):
+        """Return the storage name for content with digest, keeping the extension for content types."""
+        extension = PurePath(original_filename).suffix.lower()
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+    
+    @staticmethod
+    def acquire(digest):
+        """Take a reference on the blob with digest and return it, or None if there is none."""
+        blob = AttachmentBlob.objects.filter(sha256=digest).first()
+        if blob is None:
+            return None
+        # The row may have been released to zero and deleted since it was read
+        if not AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1):
+            return None
+        blob.ref_count += 1
+        return blob
+    
+    @staticmethod
+    def store(content, original_filename):
+        """
+        Return a blob holding content, with a reference taken for the caller.
+        
+        The content is hashed as it is read; when a blob already has those
+        bytes nothing is written, otherwise they are saved under the hash.
+        """
+        digest = AttachmentService.hash_file(content)
+        while True:
+            blob = AttachmentService.acquire(digest)
+            if blob is not None:
+                return blob
+            
+            blob = AttachmentBlob(sha256=digest, size=content.size, ref_count=1)
+            blob.file.save(AttachmentService.blob_name(digest, original_filename), content, save=False)
+            try:
+                with transaction.atomic():
+                    blob.save()
+                generate_attachment_previews.enqueue(blob_id=blob.pk)
+                return blob
+            except IntegrityError:
+                # Another upload of the same bytes got there first; use its blob
+                blob.file.delete(save=False)
+    
+    @staticmethod
+    def store_later(content, original_filename):
+        """
+        Return a blob for content, a File with a temporary_file_path, with a reference taken for the caller.
+        
+        Unlike store, new bytes are not written yet: the blob row names
+        their storage path, and the file is moved there once the current
+        transaction commits, so a rollback leaves the source file in place
+        and nothing in storage.
+        """
+        digest = AttachmentService.hash_file(content)
+        while True:
+            blob = AttachmentService.acquire(digest)
+            if blob is not None:
+                return blob
+            
+            blob = AttachmentBlob(sha256=digest, size=content.size, ref_count=1)
+            blob.file.name = AttachmentService.blob_name(digest, original_filename)
+            try:
+                with transaction.atomic():
+                    blob.save()
+                break
+            except IntegrityError:
+                # Another upload of the same bytes got there first; use its blob
+                pass
+        
+        storage = blob.file.storage
+        name = blob.file.name
+        
+        def move_into_place():
+            # Bytes left at the name by an earlier failed move hash the same
+            if not storage.exists(name):
+                with content.open('rb'):
+                    storage.save(name, content)
+            generate_attachment_previews.enqueue(blob_id=blob.pk)
+        
+        transaction.on_commit(move_into_place)
+        return blob
+    
+    @staticmethod
+    def attach(class_schedule, content, original_filename):
+        """Create an attachment of class_schedule for content, storing the bytes only if they are new."""
+        with transaction.atomic():
+            blob = AttachmentService.store(content, original_filename)
+            return AttachmentService.create_attachment(class_schedule, blob, original_filename)
+    
+    @staticmethod
+    def attach_existing(class_schedule, digest, size, original_filename):
+        """Create an attachment for content the server already holds, or return None if it does not."""
+        with transaction.atomic():
+            blob = AttachmentService.acquire(digest)
+            if blob is None:
+                return None
+            if blob.size != size:
+                AttachmentService.release(blob.pk)
+                return None
+            return AttachmentService.create_attachment(class_schedule, blob, original_filename)
+    
+    @staticmethod
+    def create_attachment(class_schedule, blob, original_filename):
+        """Create an attachment pointing at blob, which the caller holds a reference on."""
+        attachment = ClassAttachment(
+            class_schedule=class_schedule,
+            blob=blob,
+            original_filename=original_filename,
+            file_size=blob.size,
+        )
+        attachment.file.name = blob.file.name
+        attachment.save()
+        return attachment
+    
+    @staticmethod
+    def release(blob_id):
+        """Drop a reference on a blob, deleting it and its files once nothing uses it."""
+        with transaction.atomic():
+            AttachmentBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            blob = AttachmentBlob.objects.filter(pk=blob_id, ref_count=0).first()
+            if blob is None:
+                return
+            blob.delete()
+            # Only remove the bytes once the delete is sure to stick
+            storage = blob.file.storage
+            names = [field.name for field in (blob.file, blob.thumbnail, blob.preview) if field]
+            
+            def delete_files():
+                for name in names:
+                    storage.delete(name)
+            
+            transaction.on_commit(delete_files)
@@ -0,0 +1,74 @@
+"""
+Cache-aside helpers with versioned keys for read-heavy endpoints.
+"""
+
+import hashlib
+import time
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+# Namespace for anything built from the shared class list
+CLASSES_NAMESPACE = 'classes'
+
+
+# Namespace bumped when an inbox entry is written for students in bulk
+STUDENT_INBOXES_NAMESPACE = 'inbox_students'
+
+
+def alarms_namespace(user_id):
+    """Return the namespace for anything built from one user's alarms."""
+    return f"alarms_{user_id}"
+
+
+def inbox_namespace(user_id):
+    """Return the namespace bumped whenever one user's notification inbox changes."""
+    return f"inbox_{user_id}"
+
+
+def get_versions(namespaces):
+    """Return the current version of each namespace, starting any that are missing."""
+    version_keys = {namespace: f"cache_version_{namespace}" for namespace in namespaces}
+    versions = cache.get_many(version_keys.values())
+    
+    for version_key in version_keys.values():
+        if version_key not in versions:
+            # Start from the clock rather than 0 so an evicted counter can
+            # never come back to a version that still has entries cached
+            cache.add(version_key, time.time_ns(), None)
+            versions[version_key] = cache.get(version_key)
+    return [versions[version_keys[namespace]] for namespace in namespaces]
+
+
+def invalidate(namespace):
+    """Make every entry cached under namespace unreachable."""
+    version_key = f"cache_version_{namespace}"
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, time.time_ns(), None)
+
+
+def invalidate_many(namespaces):
+    """Make every entry cached under any of namespaces unreachable, in one round trip."""
+    # A fresh clock value retires a version just as an increment does
+    version = time.time_ns()
+    cache.set_many({f"cache_version_{namespace}": version for namespace in namespaces}, None)
+
+
+def get_or_build(prefix, key_parts, build, namespaces=(CLASSES_NAMESPACE,), timeout=DEFAULT_TIMEOUT):
+    """
+    Return the cached value for key_parts, calling build() on a miss.
+    
+    The key embeds the version of each namespace the value depends on, so
+    invalidate() never has to find the entries it retires; they just expire.
+    """
+    versions = get_versions(namespaces)
+    raw_key = '|'.join(str(part) for part in [*key_parts, *versions])
+    cache_key = f"{prefix}_{hashlib.md5(raw_key.encode()).hexdigest()}"
+    
+    value = cache.get(cache_key)
+    if value is None:
+        value = build()
+        cache.set(cache_key, value, timeout)
+    return value
@@ -0,0 +1,113 @@
+"""
+Columnar serialization of .values_list() rows for hot list endpoints.
+"""
+
+import json
+from json.encoder import encode_basestring
+from django.utils import timezone
+
+
+def _escape(text):
+    """Escape the line separators JSON allows but JavaScript does not, as DRF's renderer does."""
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def string(value):
+    """Format a string, or null."""
+    return 'null' if value is None else encode_basestring(value)
+
+
+def number(value):
+    """Format an integer, or null."""
+    return 'null' if value is None else str(value)
+
+
+def iso_date(value):
+    """Format a date or time the way DRF does, or null."""
+    return 'null' if value is None else f'"{value.isoformat()}"'
+
+
+def per_timezone(factory):
+    """Mark a formatter factory that takes the current time zone and returns the formatter."""
+    factory.per_timezone = True
+    return factory
+
+
+@per_timezone
+def iso_datetime(tz):
+    """Return a formatter for aware datetimes in tz the way DRF renders them, or null."""
+    def format_datetime(value):
+        if value is None:
+            return 'null'
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return f'"{value}"'
+    return format_datetime
+
+
+class ColumnarSerializer:
+    """
+    Serialize .values_list() rows straight to JSON with a prebuilt field plan.
+
+    Each field is (name, lookups, formatter): the formatter gets the values
+    of its lookups and returns their JSON text. The plan is built once per
+    time zone, so a row costs one formatter call per field with no model
+    instances or serializer fields in between.
+    """
+
+    def __init__(self, fields):
+        self.fields = []
+        lookups = []
+        for name, field_lookups, formatter in fields:
+            self.fields.append((encode_basestring(name) + ':', len(lookups), len(field_lookups), formatter))
+            lookups.extend(field_lookups)
+        self.lookups = tuple(lookups)
+        self.plans = {}
+
+    def get_plan(self):
+        """Return the row function for the current time zone."""
+        # Looking the time zone up once per render rather than per datetime
+        # saves about as much as skipping the serializer fields does
+        tz = timezone.get_current_timezone()
+        if tz not in self.plans:
+            self.plans[tz] = self._build_plan(tz)
+        return self.plans[tz]
+
+    def _build_plan(self, tz):
+        """
+        Bind the fields into one function turning a row into a JSON object.
+
+        Each step is a (prefix, slice, formatter) tuple resolved here, so a
+        row costs one slice and one formatter call per field.
+        """
+        steps = []
+        for position, (prefix, start, width, formatter) in enumerate(self.fields):
+            if getattr(formatter, 'per_timezone', False):
+                formatter = formatter(tz)
+            steps.append(((',' if position else '{') + prefix, slice(start, start + width), formatter))
+        steps = tuple(steps)
+
+        def dump_row(row):
+            return ''.join([prefix + formatter(*row[columns]) for prefix, columns, formatter in steps]) + '}'
+        return dump_row
+
+    def index(self, lookup):
+        """Return the position of lookup in each row."""
+        return self.lookups.index(lookup)
+
+    def rows(self, queryset):
+        """Return queryset as rows for this plan."""
+        return queryset.values_list(*self.lookups)
+
+    def dumps(self, rows):
+        """Return rows as a JSON array."""
+        return '[' + ','.join(map(self.get_plan(), rows)) + ']'
+
+    def render(self, rows, **envelope):
+        """Return rows as JSON bytes, wrapped as the 'results' of envelope when one is given."""
+        content = self.dumps(rows)
+        if envelope:
+            head = json.dumps(envelope, ensure_ascii=False, separators=(',', ':'))
+            content = f'{head[:-1]},"results":{content}}}'
+        return _escape(content).encode()
@@ -0,0 +1,165 @@
+"""
+Django management command to benchmark the hot query paths with and without
+the composite indexes.
+"""
+
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from users.models import User
+from classes.models import ClassSchedule, AlarmSettings, NotificationLog
+from classes.notification_service import NotificationService
+
+
+# Indexes added for the hot paths, as (model, index name)
+COMPOSITE_INDEXES = [
+    (ClassSchedule, 'class_sched_date_time_idx'),
+    (ClassSchedule, 'class_sched_creator_date_idx'),
+    (AlarmSettings, 'alarm_sched_enabled_idx'),
+    (NotificationLog, 'notif_log_user_sent_idx'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and compare query plans and timings with and without the composite indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedules', type=int, default=100_000, help='Class schedules to seed (default: 100000)')
+        parser.add_argument('--alarms', type=int, default=1_000_000, help='Alarm settings to seed (default: 1000000)')
+        parser.add_argument('--users', type=int, default=5_000, help='Users to seed (default: 5000)')
+        parser.add_argument('--logs', type=int, default=200_000, help='Notification logs to seed (default: 200000)')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per query (default: 20)')
+
+    def handle(self, *args, **options):
+        if options['alarms'] > options['users'] * options['schedules']:
+            self.stderr.write('--alarms cannot exceed --users x --schedules')
+            return
+
+        # Work on the test database so the real one is never touched
+        # destroy_test_db points the connection back at this name
+        old_name = connection.settings_dict['NAME']
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        self.stdout.write(f'Using throwaway database {test_db}')
+
+        try:
+            self.seed(options)
+            with_indexes = self.measure(options['runs'])
+
+            with connection.schema_editor() as schema_editor:
+                for model, name in COMPOSITE_INDEXES:
+                    index = next(index for index in model._meta.indexes if index.name == name)
+                    schema_editor.remove_index(model, index)
+            without_indexes = self.measure(options['runs'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for label in with_indexes:
+            before_plan, before_ms = without_indexes[label]
+            after_plan, after_ms = with_indexes[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            self.stdout.write(f'  before: {before_ms:8.3f} ms  {before_plan}')
+            self.stdout.write(f'  after:  {after_ms:8.3f} ms  {after_plan}')
+
+    def seed(self, options):
+        """Fill the database with a term's worth of synthetic data."""
+        rng = random.Random(42)
+        today = date.today()
+        subjects = [choice for choice, _label in ClassSchedule.SUBJECT_CHOICES]
+        venues = [choice for choice, _label in ClassSchedule.VENUE_CHOICES]
+        minutes_choices = [choice for choice, _label in AlarmSettings.ALARM_CHOICES]
+
+        self.stdout.write(f'Seeding {options["users"]} users...')
+        User.objects.bulk_create(
+            [User(email=f'bench{i}@giki.edu.pk', username=f'bench{i}') for i in range(options['users'])],
+            batch_size=5000,
+        )
+        user_ids = list(User.objects.values_list('id', flat=True))
+        cr_ids = user_ids[:max(len(user_ids) // 50, 1)]
+
+        self.stdout.write(f'Seeding {options["schedules"]} class schedules...')
+        ClassSchedule.objects.bulk_create(
+            [
+                ClassSchedule(
+                    created_by_id=rng.choice(cr_ids),
+                    subject=rng.choice(subjects),
+                    venue=rng.choice(venues),
+                    date=today + timedelta(days=rng.randint(-60, 60)),
+                    time=f'{rng.randint(8, 17):02d}:{rng.choice([0, 30]):02d}',
+                )
+                for _ in range(options['schedules'])
+            ],
+            batch_size=5000,
+        )
+        schedules = list(ClassSchedule.objects.values_list('id', 'date', 'time'))
+
+        self.stdout.write(f'Seeding {options["alarms"]} alarm settings...')
+        per_user, extra = divmod(options['alarms'], len(user_ids))
+        batch = []
+        for position, user_id in enumerate(user_ids):
+            count = min(per_user + (1 if position < extra else 0), len(schedules))
+            for schedule_id, class_date, class_time in rng.sample(schedules, count):
+                minutes = rng.choice(minutes_choices)
+                starts_at = timezone.make_aware(datetime.combine(class_date, class_time))
+                batch.append(AlarmSettings(
+                    user_id=user_id,
+                    class_schedule_id=schedule_id,
+                    is_enabled=rng.random() < 0.9,
+                    alarm_minutes_before=minutes,
+                    fires_at=starts_at - timedelta(minutes=minutes),
+                ))
+            if len(batch) >= 20000:
+                AlarmSettings.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        AlarmSettings.objects.bulk_create(batch, batch_size=5000)
+
+        self.stdout.write(f'Seeding {options["logs"]} notification logs...')
+        NotificationLog.objects.bulk_create(
+            [
+                NotificationLog(
+                    user_id=rng.choice(user_ids),
+                    class_schedule_id=rng.choice(schedules)[0],
+                    notification_type='alarm',
+                    message='benchmark',
+                )
+                for _ in range(options['logs'])
+            ],
+            batch_size=5000,
+        )
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('VACUUM ANALYZE')
+
+    def measure(self, runs):
+        """Return {label: (plan, median milliseconds)} for each hot path."""
+        today = date.today()
+        now = timezone.now()
+        user = User.objects.order_by('id').first()
+        cr = ClassSchedule.objects.order_by('id').first().created_by
+        busy_class = AlarmSettings.objects.order_by('id').first().class_schedule
+
+        queries = {
+            "Today's classes": ClassSchedule.objects.for_list().filter(date=today).order_by('date', 'time', 'id'),
+            'Upcoming classes (first page)': ClassSchedule.objects.for_list().filter(date__gte=today).order_by('date', 'time', 'id')[:21],
+            "CR's classes (first page)": ClassSchedule.objects.for_list().filter(created_by=cr).order_by('date', 'time', 'id')[:21],
+            'Enabled alarms for a class': AlarmSettings.objects.filter(class_schedule=busy_class, is_enabled=True),
+            'Due alarms (one-hour window)': NotificationService.get_due_single_alarms(now - timedelta(hours=1), now),
+            "User's recent notifications": NotificationLog.objects.filter(user=user).order_by('-sent_at')[:20],
+        }
+
+        results = {}
+        for label, queryset in queries.items():
+            plan = ' | '.join(line.strip() for line in queryset.explain().splitlines())
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = (plan, statistics.median(timings))
+        return results
@@ -0,0 +1,126 @@
+"""
+Django management command to benchmark JSON rendering and response
+compression for the class list and timetable endpoints.
+"""
+
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from users.models import User
+from classes.models import ClassSchedule
+from classes.renderers import FastJSONRenderer, orjson
+from classalarm_backend.middleware import brotli
+
+
+# Endpoints to measure, as (label, path)
+ENDPOINTS = [
+    ('Upcoming classes (100 per page)', '/api/classes/upcoming/?page_size=100'),
+    ('Timetable', '/api/classes/timetable/'),
+]
+
+# Per-process cache the benchmark runs against instead of the shared one
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark_payloads'},
+}
+
+# Accept-Encoding headers to compare, as (label, header)
+ENCODINGS = [
+    ('identity', 'identity'),
+    ('gzip', 'gzip'),
+    ('br', 'br, gzip'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database and compare render times and bytes on the wire for the class list and timetable endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedules', type=int, default=2_000, help='Class schedules to seed (default: 2000)')
+        parser.add_argument('--runs', type=int, default=50, help='Timed runs per measurement (default: 50)')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write('orjson is not installed; FastJSONRenderer falls back to the stdlib encoder')
+        if brotli is None:
+            self.stdout.write('brotli is not installed; br requests are answered with gzip')
+
+        # Work on the test database and a private cache so the real ones are
+        # never touched: clearing the shared cache would empty it for every
+        # process, and the seeded timetables would be cached under user IDs
+        # that exist in the real database too
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            # destroy_test_db points the connection back at this name
+            old_name = connection.settings_dict['NAME']
+            test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            self.stdout.write(f'Using throwaway database {test_db}')
+
+            try:
+                user = self.seed(options)
+                client = APIClient(SERVER_NAME='localhost')
+                client.force_authenticate(user)
+                for label, path in ENDPOINTS:
+                    self.report(label, client, path, options['runs'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options):
+        """Fill the database with a term's worth of synthetic classes and return a student."""
+        rng = random.Random(42)
+        today = date.today()
+        subjects = [choice for choice, _label in ClassSchedule.SUBJECT_CHOICES]
+        venues = [choice for choice, _label in ClassSchedule.VENUE_CHOICES]
+
+        self.stdout.write(f'Seeding {options["schedules"]} class schedules...')
+        cr = User.objects.create_user(email='bench-cr@giki.edu.pk', username='bench-cr')
+        ClassSchedule.objects.bulk_create(
+            [
+                ClassSchedule(
+                    created_by=cr,
+                    subject=rng.choice(subjects),
+                    venue=rng.choice(venues),
+                    date=today + timedelta(days=rng.randint(0, 60)),
+                    time=f'{rng.randint(8, 17):02d}:{rng.choice([0, 30]):02d}',
+                    note=rng.choice(['', 'Bring your lab manual', 'Quiz in the first half hour']),
+                )
+                for _ in range(options['schedules'])
+            ],
+            batch_size=5000,
+        )
+        return User.objects.create_user(email='bench-student@giki.edu.pk', username='bench-student')
+
+    def report(self, label, client, path, runs):
+        """Print render times and response sizes for one endpoint."""
+        cache.clear()
+        data = json.loads(client.get(path, HTTP_ACCEPT_ENCODING='identity').content)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            milliseconds = self.time(lambda: renderer.render(data), runs)
+            self.stdout.write(f'  {type(renderer).__name__ + ":":20} render {milliseconds:8.3f} ms')
+
+        # Responses are served from the shared cache, so this is what a warm
+        # request costs end to end, compression included
+        for encoding, accept_encoding in ENCODINGS:
+            response = client.get(path, HTTP_ACCEPT_ENCODING=accept_encoding)
+            sent = response.get('Content-Encoding', 'identity')
+            milliseconds = self.time(lambda: client.get(path, HTTP_ACCEPT_ENCODING=accept_encoding), runs)
+            self.stdout.write(
+                f'  {encoding + ":":20} {len(response.content):8d} bytes ({sent})  response {milliseconds:8.3f} ms'
+            )
+
+    def time(self, action, runs):
+        """Return the median milliseconds action takes."""
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            action()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -15,10 +15,11 @@ class Command(BaseCommand):
         notifications_sent = NotificationService.check_and_send_alarms()
         
         if notifications_sent:
+            total = sum(notification['recipients'] for notification in notifications_sent)
             self.stdout.write(
-                self.style.SUCCESS(f'Sent {len(notifications_sent)} alarm notifications')
+                self.style.SUCCESS(f'Sent {total} alarm notifications')
             )
             for notification in notifications_sent:
-                self.stdout.write(f'  - {notification["user"]}: {notification["class"]} ({notification["time"]}m)')
+                self.stdout.write(f'  - {notification["class"]} on {notification["date"]} at {notification["time"]}: {notification["recipients"]} users')
         else:
             self.stdout.write('No alarm notifications to send')
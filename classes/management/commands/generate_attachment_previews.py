@@ -0,0 +1,37 @@
+"""
+Django management command to make attachment thumbnails and previews that
+are still missing.
+"""
+
+from django.core.management.base import BaseCommand
+from classes.models import AttachmentBlob
+from classes.preview_service import PreviewService, pdfium
+
+
+class Command(BaseCommand):
+    help = 'Make thumbnails and previews for attachments that have none yet, such as files stored before previews existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Try again on files whose previews failed')
+        parser.add_argument(
+            '--retry-unsupported', action='store_true',
+            help='Try again on files marked unsupported, e.g. PDFs after installing pypdfium2'
+        )
+
+    def handle(self, *args, **options):
+        if pdfium is None:
+            self.stdout.write('pypdfium2 is not installed; PDFs are marked unsupported')
+
+        retry = [status for status in ('failed', 'unsupported') if options[f'retry_{status}']]
+        if retry:
+            AttachmentBlob.objects.filter(preview_status__in=retry).update(preview_status='pending')
+
+        made = {}
+        pending = AttachmentBlob.objects.filter(preview_status='pending').values_list('id', flat=True)
+        for blob_id in list(pending):
+            status = PreviewService.generate(blob_id)
+            if status:
+                made[status] = made.get(status, 0) + 1
+
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(made.items())) or 'nothing to do'
+        self.stdout.write(self.style.SUCCESS(f'Attachment previews: {summary}'))
@@ -0,0 +1,14 @@
+"""
+Django management command to delete alarm delivery records no check can still need.
+"""
+
+from django.core.management.base import BaseCommand
+from classes.notification_service import NotificationService
+
+
+class Command(BaseCommand):
+    help = 'Delete alarm delivery records older than the alarm lookback window (run daily)'
+
+    def handle(self, *args, **options):
+        deleted = NotificationService.purge_deliveries()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} alarm deliveries'))
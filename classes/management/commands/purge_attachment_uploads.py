@@ -0,0 +1,14 @@
+"""
+Django management command to discard abandoned resumable uploads.
+"""
+
+from django.core.management.base import BaseCommand
+from classes.upload_service import UploadService
+
+
+class Command(BaseCommand):
+    help = 'Delete attachment uploads left unfinished past the upload expiry, with their partial files (run daily)'
+
+    def handle(self, *args, **options):
+        deleted = UploadService.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} abandoned uploads'))
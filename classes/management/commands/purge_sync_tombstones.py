@@ -0,0 +1,14 @@
+"""
+Django management command to delete sync tombstones no client can still need.
+"""
+
+from django.core.management.base import BaseCommand
+from classes.sync_service import SyncService
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than the retention window (run daily)'
+
+    def handle(self, *args, **options):
+        deleted = SyncService.purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones'))
@@ -0,0 +1,148 @@
+"""
+Django management command that runs the alarm scheduler daemon.
+"""
+
+import heapq
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from classes.models import ClassSchedule, AlarmSettings
+from classes.notification_service import NotificationService, ALARM_LOOKBACK
+
+
+# Re-read rows changed slightly before the last refresh to cover saves that
+# were still in flight when it ran
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class Command(BaseCommand):
+    help = 'Run the alarm scheduler, sleeping until the next alarm is due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon', type=int, default=60,
+            help='Minutes of upcoming alarms to hold in memory (default: 60)'
+        )
+        parser.add_argument(
+            '--refresh', type=float, default=15,
+            help='Seconds between checks for changed alarm settings (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        self.horizon = timedelta(minutes=options['horizon'])
+        self.refresh_interval = timedelta(seconds=options['refresh'])
+
+        # Min-heap of (fires_at, key); fire_times holds the live entry per key
+        # so superseded heap entries can be skipped when popped. Keys are
+        # ('alarm', alarm id) for stored settings and ('default', class id,
+        # minutes) for alarms worked out per occurrence: the defaults users
+        # get without a setting, and every setting on a recurring class.
+        self.heap = []
+        self.fire_times = {}
+        self.offsets = [minutes for minutes, _label in AlarmSettings.ALARM_CHOICES]
+
+        self.stdout.write('🔔 Alarm Scheduler Started - Press Ctrl+C to stop')
+
+        now = timezone.now()
+        self.loaded_until = now
+        self.last_refresh = now
+
+        # Catch up on anything that fell due while the scheduler was down
+        self.dispatch(now)
+        self.load_upcoming(now)
+
+        try:
+            while True:
+                now = timezone.now()
+
+                if now - self.last_refresh >= self.refresh_interval:
+                    self.refresh(now)
+
+                if self.pop_due(now):
+                    self.dispatch(now)
+
+                wake_at = self.last_refresh + self.refresh_interval
+                if self.heap:
+                    wake_at = min(wake_at, self.heap[0][0])
+                time.sleep(max((wake_at - timezone.now()).total_seconds(), 0))
+        except KeyboardInterrupt:
+            self.stdout.write('\n🛑 Alarm Scheduler Stopped')
+
+    def schedule(self, key, fires_at):
+        """Queue an alarm, replacing any entry it already has."""
+        if self.fire_times.get(key) == fires_at:
+            return
+        self.fire_times[key] = fires_at
+        heapq.heappush(self.heap, (fires_at, key))
+
+    def schedule_defaults(self, class_schedules, start, end):
+        """Queue the per-occurrence alarms of class_schedules that fall in (start, end]."""
+        latest_start = end + timedelta(minutes=max(self.offsets))
+        for class_schedule in class_schedules:
+            for starts_at in class_schedule.starts_between(start, latest_start):
+                for minutes in self.offsets:
+                    fires_at = starts_at - timedelta(minutes=minutes)
+                    if start < fires_at <= end:
+                        self.schedule(('default', class_schedule.id, minutes), fires_at)
+
+    def load_upcoming(self, now):
+        """Queue alarms that have moved inside the horizon."""
+        until = now + self.horizon
+        upcoming = AlarmSettings.objects.filter(
+            is_enabled=True,
+            fires_at__gt=self.loaded_until,
+            fires_at__lte=until,
+        ).values_list('id', 'fires_at')
+
+        for alarm_id, fires_at in upcoming:
+            self.schedule(('alarm', alarm_id), fires_at)
+
+        classes = ClassSchedule.objects.alarm_due_between(self.loaded_until, until, self.offsets)
+        self.schedule_defaults(self.with_occurrences(classes), self.loaded_until, until)
+        self.loaded_until = until
+
+    def refresh(self, now):
+        """Pick up alarm settings and classes changed since the last refresh."""
+        since = self.last_refresh - REFRESH_OVERLAP
+        self.last_refresh = now
+
+        changed = AlarmSettings.objects.filter(updated_at__gt=since).values_list('id', 'fires_at', 'is_enabled')
+        for alarm_id, fires_at, is_enabled in changed:
+            if is_enabled and fires_at is not None and fires_at <= self.loaded_until:
+                self.schedule(('alarm', alarm_id), fires_at)
+            else:
+                self.fire_times.pop(('alarm', alarm_id), None)
+
+        # Every offset is already queued per occurrence, so a changed
+        # preference needs no reload; a changed or cancelled class does. A
+        # class posted or moved at short notice may have alarms already past
+        # due, which are queued to fire straight away
+        changed_classes = ClassSchedule.objects.filter(updated_at__gt=since)
+        for class_schedule in self.with_occurrences(changed_classes):
+            for minutes in self.offsets:
+                self.fire_times.pop(('default', class_schedule.id, minutes), None)
+            self.schedule_defaults([class_schedule], now - ALARM_LOOKBACK, self.loaded_until)
+
+        self.load_upcoming(now)
+
+    def with_occurrences(self, class_schedules):
+        """Load just what is needed to expand class_schedules into occurrences."""
+        return class_schedules.only('id', 'date', 'time', 'recurrence', 'repeat_until').prefetch_related('cancellations')
+
+    def pop_due(self, now):
+        """Pop every alarm due by now and report whether any is still live."""
+        due = False
+        while self.heap and self.heap[0][0] <= now:
+            fires_at, key = heapq.heappop(self.heap)
+            if self.fire_times.get(key) == fires_at:
+                del self.fire_times[key]
+                due = True
+        return due
+
+    def dispatch(self, now):
+        """Send every alarm that is due, using the set-based checker."""
+        notifications_sent = NotificationService.check_and_send_alarms(now)
+
+        for notification in notifications_sent:
+            self.stdout.write(f'[{timezone.localtime(now):%H:%M:%S}] {notification["class"]} on {notification["date"]} at {notification["time"]}: {notification["recipients"]} users')
@@ -0,0 +1,66 @@
+"""
+Django management command that runs background tasks from the database queue.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from classes.task_queue import DatabaseBroker, get_broker, run_in_thread
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (alarm checks, test notifications, attachment previews)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues', default=','.join(settings.TASK_QUEUE_LIMITS),
+            help='Comma-separated queues to take tasks from, highest priority first (default: all)'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Tasks this worker runs at once, each on its own thread (default: 4)'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1,
+            help='Seconds to wait before looking again when no task is due (default: 1)'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no task is due instead of waiting for more, e.g. from cron'
+        )
+
+    def handle(self, *args, **options):
+        broker = get_broker()
+        if not isinstance(broker, DatabaseBroker):
+            raise CommandError('TASK_BROKER does not queue tasks in the database; there is nothing for a worker to run')
+
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        concurrency = max(options['concurrency'], 1)
+        self.stdout.write(f'⚙️ Task Worker Started on {", ".join(queues)} - Press Ctrl+C to stop')
+
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task-worker')
+        try:
+            while True:
+                if len(running) < concurrency:
+                    for task in broker.claim(queues, concurrency - len(running)):
+                        running[executor.submit(run_in_thread, broker.execute, task)] = task
+
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                # Claim more as soon as a slot frees up, or after the poll
+                # interval if none does
+                done, _pending = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    self.stdout.write(f'[{timezone.localtime():%H:%M:%S}] {task.name} (attempt {task.attempts})')
+        except KeyboardInterrupt:
+            self.stdout.write('\n🛑 Task Worker Stopping - finishing running tasks')
+        finally:
+            executor.shutdown(wait=True)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:41
+
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_fires_at(apps, schema_editor):
+    AlarmSettings = apps.get_model('classes', 'AlarmSettings')
+    alarm_settings = AlarmSettings.objects.select_related('class_schedule')
+    for alarm_setting in alarm_settings.iterator():
+        class_schedule = alarm_setting.class_schedule
+        starts_at = timezone.make_aware(datetime.combine(class_schedule.date, class_schedule.time))
+        alarm_setting.fires_at = starts_at - timedelta(minutes=alarm_setting.alarm_minutes_before)
+        alarm_setting.save(update_fields=['fires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0004_alter_alarmsettings_alarm_minutes_before_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alarmsettings',
+            name='fires_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_fires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0005_alarmsettings_fires_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence', models.DateTimeField(help_text='Fire time of the delivered alarm')),
+                ('claim', models.UUIDField(db_index=True, editable=False)),
+                ('claimed_at', models.DateTimeField(auto_now_add=True)),
+                ('class_schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alarm_deliveries', to='classes.classschedule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alarm_deliveries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Alarm Delivery',
+                'verbose_name_plural': 'Alarm Deliveries',
+                'db_table': 'alarm_deliveries',
+                'ordering': ['-claimed_at'],
+                'unique_together': {('user', 'class_schedule', 'occurrence')},
+            },
+        ),
+    ]
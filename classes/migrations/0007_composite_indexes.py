@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0006_alarmdelivery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alarmsettings',
+            index=models.Index(fields=['class_schedule', 'is_enabled'], name='alarm_sched_enabled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['date', 'time', 'id'], name='class_sched_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['created_by', 'date', 'time'], name='class_sched_creator_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['user', '-sent_at'], name='notif_log_user_sent_idx'),
+        ),
+    ]
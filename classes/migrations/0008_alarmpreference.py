@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_default_alarm_settings(apps, schema_editor):
+    # No preferences exist yet, so rows matching the global default add nothing
+    AlarmSettings = apps.get_model('classes', 'AlarmSettings')
+    AlarmSettings.objects.filter(is_enabled=True, alarm_minutes_before=20).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0007_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_enabled', models.BooleanField(default=True)),
+                ('alarm_minutes_before', models.IntegerField(choices=[(5, '5 minutes before'), (10, '10 minutes before'), (15, '15 minutes before'), (20, '20 minutes before'), (30, '30 minutes before'), (60, '1 hour before'), (120, '2 hours before'), (180, '3 hours before')], default=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alarm_preference', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Alarm Preference',
+                'verbose_name_plural': 'Alarm Preferences',
+                'db_table': 'alarm_preferences',
+            },
+        ),
+        migrations.RunPython(drop_default_alarm_settings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0008_alarmpreference'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassCancellation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Class Cancellation',
+                'verbose_name_plural': 'Class Cancellations',
+                'db_table': 'class_cancellations',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='classschedule',
+            name='recurrence',
+            field=models.CharField(choices=[('none', 'Does not repeat'), ('weekly', 'Weekly')], default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='classschedule',
+            name='repeat_until',
+            field=models.DateField(blank=True, help_text='Last date a weekly class can meet (end of term)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['recurrence', 'repeat_until'], name='class_sched_recurrence_idx'),
+        ),
+        migrations.AddField(
+            model_name='classcancellation',
+            name='class_schedule',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cancellations', to='classes.classschedule'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='classcancellation',
+            unique_together={('class_schedule', 'date')},
+        ),
+    ]
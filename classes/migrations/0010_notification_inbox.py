@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def acknowledge_existing_logs(apps, schema_editor):
+    # Logs written before the inbox existed were delivered through the cache
+    NotificationLog = apps.get_model('classes', 'NotificationLog')
+    NotificationLog.objects.filter(acknowledged_at__isnull=True).update(acknowledged_at=models.F('sent_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0009_class_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cleared_through', models.BigIntegerField(default=0, help_text='ID of the newest notification log cleared')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Notification Inbox',
+                'verbose_name_plural': 'Notification Inboxes',
+                'db_table': 'notification_inboxes',
+            },
+        ),
+        migrations.AddField(
+            model_name='notificationlog',
+            name='acknowledged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(acknowledge_existing_logs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notificationlog',
+            index=models.Index(fields=['user', 'id'], name='notif_log_user_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationinbox',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_inbox', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
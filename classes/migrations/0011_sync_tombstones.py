@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0010_notification_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('class', 'Class Schedule'), ('attachment', 'Class Attachment'), ('alarm', 'Alarm Setting')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'db_table': 'sync_tombstones',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='alarmsettings',
+            index=models.Index(fields=['user', 'updated_at'], name='alarm_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classattachment',
+            index=models.Index(fields=['uploaded_at'], name='class_attach_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classschedule',
+            index=models.Index(fields=['updated_at'], name='class_sched_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Owner of a per-user row; empty for rows every user syncs', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:21
+
+import hashlib
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_existing_attachments(apps, schema_editor):
+    # Existing files become blobs where they already are; later copies of the
+    # same bytes point at the first one. Their own files are left on disk
+    ClassAttachment = apps.get_model('classes', 'ClassAttachment')
+    AttachmentBlob = apps.get_model('classes', 'AttachmentBlob')
+    for attachment in ClassAttachment.objects.order_by('id'):
+        if not attachment.file or not attachment.file.storage.exists(attachment.file.name):
+            continue
+        digest = hashlib.sha256()
+        with attachment.file.open('rb') as content:
+            for chunk in content.chunks():
+                digest.update(chunk)
+        blob, _created = AttachmentBlob.objects.get_or_create(
+            sha256=digest.hexdigest(),
+            defaults={'file': attachment.file.name, 'size': attachment.file_size},
+        )
+        AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') + 1)
+        ClassAttachment.objects.filter(pk=attachment.pk).update(blob=blob, file=blob.file.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0012_attachment_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(upload_to='attachment_blobs/')),
+                ('size', models.PositiveIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Attachments using this content; it is deleted at zero')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Attachment Blob',
+                'verbose_name_plural': 'Attachment Blobs',
+                'db_table': 'attachment_blobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='classattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='classes.attachmentblob'),
+        ),
+        migrations.RunPython(link_existing_attachments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_dates(apps, schema_editor):
+    # Alarms fire at most a few hours before their class, so the class met on
+    # the fire time's date, or the next day if it starts before that time
+    AlarmDelivery = apps.get_model('classes', 'AlarmDelivery')
+    deliveries = AlarmDelivery.objects.select_related('class_schedule')
+    for delivery in deliveries.iterator():
+        fires_at = timezone.localtime(delivery.occurrence)
+        delivery.date = fires_at.date()
+        if delivery.class_schedule.time < fires_at.time():
+            delivery.date += timedelta(days=1)
+        delivery.save(update_fields=['date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0015_task_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alarmdelivery',
+            name='date',
+            field=models.DateField(null=True, help_text='Date of the class occurrence the alarm was for'),
+        ),
+        migrations.RunPython(backfill_dates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='alarmdelivery',
+            unique_together=set(),
+        ),
+        # Deliveries of one occurrence at several fire times collapse into one
+        migrations.RunSQL(
+            """
+            DELETE FROM alarm_deliveries WHERE id NOT IN (
+                SELECT MIN(id) FROM alarm_deliveries GROUP BY user_id, class_schedule_id, date
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='alarmdelivery',
+            name='occurrence',
+        ),
+        migrations.AlterField(
+            model_name='alarmdelivery',
+            name='date',
+            field=models.DateField(help_text='Date of the class occurrence the alarm was for'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='alarmdelivery',
+            unique_together={('user', 'class_schedule', 'date')},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0016_alarmdelivery_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskQueue',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('claimed_at', models.DateTimeField(blank=True, help_text='When a worker last claimed tasks from it', null=True)),
+            ],
+            options={
+                'verbose_name': 'Task queue',
+                'verbose_name_plural': 'Task queues',
+                'db_table': 'task_queues',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0017_task_queues'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationlog',
+            name='date',
+            field=models.DateField(blank=True, help_text='Date of the class occurrence an alarm was for', null=True),
+        ),
+    ]
@@ -1,9 +1,134 @@
+import copy
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 
 User = get_user_model()
 
+# Alarm offset used when a user has set neither a preference nor an override
+DEFAULT_ALARM_MINUTES = 20
+
+
+def cancelled_on(day, class_schedule=models.OuterRef('pk')):
+    """
+    Build a test for a cancellation of a class on day.
+    
+    Either may be an outer reference: the defaults test the class being
+    filtered on day, and OuterRef('date') tests a one-off class on its date.
+    Every query that hides cancelled occurrences goes through this.
+    """
+    return models.Exists(ClassCancellation.objects.filter(class_schedule=class_schedule, date=day))
+
+
+def _occurs_on(day):
+    """Build a filter for classes with an occurrence on day."""
+    weekly = models.Q(
+        recurrence='weekly',
+        date__lt=day,
+        repeat_until__gte=day,
+        date__week_day=day.isoweekday() % 7 + 1,
+    )
+    return (models.Q(date=day) | weekly) & ~cancelled_on(day)
+
+
+def _starts_between(start, end):
+    """Build a filter for classes with an occurrence whose local date/time falls in (start, end]."""
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    
+    window = models.Q(pk__in=[])
+    day = start.date()
+    while day <= end.date():
+        times = {}
+        if day == start.date():
+            times['time__gt'] = start.time()
+        if day == end.date():
+            times['time__lte'] = end.time()
+        window |= _occurs_on(day) & models.Q(**times)
+        day += timedelta(days=1)
+    return window
+
+
+class ClassScheduleQuerySet(models.QuerySet):
+    """Query helpers for class schedules."""
+    
+    def alarm_due_between(self, start, end, offsets):
+        """Filter to classes with an alarm, at any of the minute offsets, due in (start, end]."""
+        window = models.Q(pk__in=[])
+        for minutes in offsets:
+            window |= _starts_between(start + timedelta(minutes=minutes), end + timedelta(minutes=minutes))
+        return self.filter(window)
+    
+    def singles(self):
+        """Filter to one-off classes that have not been cancelled."""
+        return self.filter(recurrence='none').exclude(cancelled_on(models.OuterRef('date')))
+    
+    def occurring_between(self, date_from=None, date_to=None):
+        """Filter to classes that may occur between the dates, inclusive; either bound is optional."""
+        single = models.Q(recurrence='none')
+        weekly = models.Q(recurrence='weekly')
+        if date_from:
+            single &= models.Q(date__gte=date_from)
+            weekly &= models.Q(repeat_until__gte=date_from)
+        if date_to:
+            single &= models.Q(date__lte=date_to)
+            weekly &= models.Q(date__lte=date_to)
+        return self.filter(single | weekly)
+    
+    def occurrences(self, date_from=None, date_to=None):
+        """Expand the classes into their occurrences between the dates, ordered by (date, time, id)."""
+        class_schedules = self.occurring_between(date_from, date_to).prefetch_related('cancellations')
+        occurrences = [
+            class_schedule.as_occurrence(day)
+            for class_schedule in class_schedules
+            for day in class_schedule.occurrence_dates(date_from, date_to)
+        ]
+        return sorted(occurrences, key=lambda occurrence: (occurrence.date, occurrence.time, occurrence.id))
+    
+    def occurrence_rows(self, fields, date_from=None, date_to=None):
+        """
+        Return one iterator per class over .values_list(*fields) rows for its
+        occurrences between the dates, each in date order.
+        
+        fields must include id, date, recurrence and repeat_until. Rows are
+        expanded without building model instances, for the list endpoints.
+        """
+        rows = list(self.occurring_between(date_from, date_to).values_list(*fields))
+        id_at, date_at = fields.index('id'), fields.index('date')
+        recurrence_at, until_at = fields.index('recurrence'), fields.index('repeat_until')
+        
+        cancelled = defaultdict(set)
+        cancellations = ClassCancellation.objects.filter(
+            class_schedule__in=[row[id_at] for row in rows]
+        ).values_list('class_schedule_id', 'date')
+        for class_schedule_id, day in cancellations:
+            cancelled[class_schedule_id].add(day)
+        
+        def expand(row):
+            class_schedule = ClassSchedule(
+                id=row[id_at], date=row[date_at], recurrence=row[recurrence_at], repeat_until=row[until_at]
+            )
+            for day in class_schedule.occurrence_dates(date_from, date_to, cancelled[row[id_at]]):
+                yield row[:date_at] + (day,) + row[date_at + 1:]
+        
+        return [expand(row) for row in rows]
+    
+    def for_list(self):
+        """Join creators and annotate attachment counts for list endpoints."""
+        # A correlated subquery rather than JOIN + GROUP BY keeps the
+        # (date, time, id) index usable for ordering and LIMIT
+        attachment_counts = ClassAttachment.objects.filter(
+            class_schedule=models.OuterRef('pk')
+        ).order_by().values('class_schedule').annotate(count=models.Count('*')).values('count')
+        return self.select_related('created_by').annotate(
+            attachment_count=Coalesce(models.Subquery(attachment_counts), 0)
+        )
+
 
 class ClassSchedule(models.Model):
     """Model for class schedules."""
@@ -29,23 +154,178 @@ class ClassSchedule(models.Model):
         ('fsce-lh2', 'FSCE-LH2'),
     ]
     
+    RECURRENCE_CHOICES = [
+        ('none', 'Does not repeat'),
+        ('weekly', 'Weekly'),
+    ]
+    
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_classes')
     subject = models.CharField(max_length=10, choices=SUBJECT_CHOICES)
     venue = models.CharField(max_length=10, choices=VENUE_CHOICES)
     date = models.DateField()
     time = models.TimeField()
     note = models.TextField(blank=True, null=True)
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, default='none')
+    repeat_until = models.DateField(blank=True, null=True, help_text='Last date a weekly class can meet (end of term)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ClassScheduleQuerySet.as_manager()
+    
+    # Set on the copies returned by as_occurrence()
+    is_occurrence = False
+    
     class Meta:
         db_table = 'class_schedules'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='class_sched_date_time_idx'),
+            models.Index(fields=['created_by', 'date', 'time'], name='class_sched_creator_date_idx'),
+            models.Index(fields=['recurrence', 'repeat_until'], name='class_sched_recurrence_idx'),
+            models.Index(fields=['updated_at'], name='class_sched_updated_idx'),
+        ]
         verbose_name = 'Class Schedule'
         verbose_name_plural = 'Class Schedules'
     
     def __str__(self):
         return f"{self.get_subject_display()} - {self.get_venue_display()} ({self.date} {self.time})"
+    
+    @property
+    def is_recurring(self):
+        """Return whether the class repeats weekly."""
+        return self.recurrence == 'weekly'
+    
+    @property
+    def starts_at(self):
+        """Return the aware datetime at which the class starts."""
+        # date/time may still be raw strings when set from form data
+        return self._starts_on(self._meta.get_field('date').to_python(self.date))
+    
+    def _starts_on(self, day):
+        """Return the aware datetime at which the class starts on day."""
+        class_time = self._meta.get_field('time').to_python(self.time)
+        return timezone.make_aware(datetime.combine(day, class_time))
+    
+    def clean(self):
+        """Validate the recurrence rule."""
+        if self.is_recurring and not self.repeat_until:
+            raise ValidationError({'repeat_until': 'Weekly classes need a last date.'})
+        if self.repeat_until and self.date and self.repeat_until < self.date:
+            raise ValidationError({'repeat_until': 'The last date cannot be before the first class.'})
+    
+    def occurrence_dates(self, date_from=None, date_to=None, cancelled=None):
+        """
+        Yield the dates the class meets between date_from and date_to,
+        inclusive, skipping cancellations (read from the class unless the
+        cancelled dates are given).
+        """
+        first = self._meta.get_field('date').to_python(self.date)
+        last = first
+        if self.is_recurring and self.repeat_until:
+            last = self._meta.get_field('repeat_until').to_python(self.repeat_until)
+        if date_to and date_to < last:
+            last = date_to
+        
+        day = first
+        if date_from and date_from > first:
+            # Jump to the first meeting on or after date_from
+            day = first + timedelta(weeks=-(-(date_from - first).days // 7))
+        
+        if cancelled is None:
+            cancelled = {cancellation.date for cancellation in self.cancellations.all()} if self.pk else set()
+        while day <= last:
+            if day not in cancelled:
+                yield day
+            day += timedelta(weeks=1)
+    
+    def starts_between(self, start, end):
+        """Return the aware start times of the occurrences that fall in (start, end]."""
+        days = self.occurrence_dates(timezone.localdate(start), timezone.localdate(end))
+        return [starts_at for starts_at in map(self._starts_on, days) if start < starts_at <= end]
+    
+    def as_occurrence(self, day):
+        """Return an unsaveable copy of the class dated to one of its occurrences."""
+        occurrence = copy.copy(self)
+        occurrence.date = day
+        occurrence.is_occurrence = True
+        return occurrence
+    
+    def save(self, *args, **kwargs):
+        """Override save to keep alarm fire times in step with the class time."""
+        if self.is_occurrence:
+            raise ValueError('Cannot save a single occurrence; save the class it belongs to.')
+        
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if adding or (update_fields is not None and not {'date', 'time', 'recurrence'} & set(update_fields)):
+            return
+        
+        # Alarms on a recurring class fire once per occurrence, so there is
+        # no single fire time to store
+        alarm_settings = self.alarm_settings.all()
+        if self.is_recurring:
+            alarm_settings.update(fires_at=None, updated_at=timezone.now())
+            return
+        
+        # One UPDATE per distinct alarm offset rather than one per setting
+        starts_at = self.starts_at
+        offsets = alarm_settings.values_list('alarm_minutes_before', flat=True).distinct()
+        for minutes in list(offsets):
+            alarm_settings.filter(alarm_minutes_before=minutes).update(
+                fires_at=starts_at - timedelta(minutes=minutes),
+                updated_at=timezone.now(),
+            )
+
+
+class ClassCancellation(models.Model):
+    """Model for a single cancelled occurrence of a class."""
+    
+    class_schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, related_name='cancellations')
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'class_cancellations'
+        verbose_name = 'Class Cancellation'
+        verbose_name_plural = 'Class Cancellations'
+        unique_together = ['class_schedule', 'date']
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.class_schedule.get_subject_display()} cancelled on {self.date}"
+
+
+class AttachmentBlob(models.Model):
+    """Model for stored attachment content, shared by every attachment with the same bytes."""
+    
+    PREVIEW_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('unsupported', 'Unsupported'),
+        ('failed', 'Failed'),
+    ]
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='attachment_blobs/')
+    size = models.PositiveIntegerField()
+    ref_count = models.PositiveIntegerField(default=0, help_text='Attachments using this content; it is deleted at zero')
+    # Small renderings of images and of a PDF's first page, stored next to the file
+    thumbnail = models.FileField(upload_to='attachment_blobs/', blank=True)
+    preview = models.FileField(upload_to='attachment_blobs/', blank=True)
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default='pending', db_index=True)
+    previewed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'attachment_blobs'
+        ordering = ['-created_at']
+        verbose_name = 'Attachment Blob'
+        verbose_name_plural = 'Attachment Blobs'
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes, {self.ref_count} refs)"
 
 
 class ClassAttachment(models.Model):
@@ -56,6 +336,8 @@ class ClassAttachment(models.Model):
         upload_to='class_attachments/%Y/%m/%d/',
         validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'gif'])]
     )
+    # The content this attachment's file points at; file holds the blob's name
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='attachments')
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -63,6 +345,9 @@ class ClassAttachment(models.Model):
     class Meta:
         db_table = 'class_attachments'
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['uploaded_at'], name='class_attach_uploaded_idx'),
+        ]
         verbose_name = 'Class Attachment'
         verbose_name_plural = 'Class Attachments'
     
@@ -75,6 +360,34 @@ class ClassAttachment(models.Model):
         return round(self.file_size / (1024 * 1024), 2)
 
 
+class AttachmentUpload(models.Model):
+    """Model for a resumable attachment upload that has not been finalized yet."""
+    
+    # The ID is the only handle a client has on its upload, so make it unguessable
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    class_schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, related_name='uploads')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attachment_uploads')
+    original_filename = models.CharField(max_length=255)
+    file_size = models.PositiveIntegerField(help_text='Total size the client declared, in bytes')
+    received = models.PositiveIntegerField(default=0, help_text='Bytes stored so far; the next chunk starts here')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    class Meta:
+        db_table = 'attachment_uploads'
+        ordering = ['-created_at']
+        verbose_name = 'Attachment Upload'
+        verbose_name_plural = 'Attachment Uploads'
+    
+    def __str__(self):
+        return f"{self.original_filename} ({self.received}/{self.file_size} bytes)"
+    
+    @property
+    def is_complete(self):
+        """Return whether every byte has been received."""
+        return self.received == self.file_size
+
+
 class AlarmSettings(models.Model):
     """Model for student alarm preferences for each class."""
     
@@ -92,7 +405,8 @@ class AlarmSettings(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alarm_settings')
     class_schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, related_name='alarm_settings')
     is_enabled = models.BooleanField(default=True)
-    alarm_minutes_before = models.IntegerField(choices=ALARM_CHOICES, default=20)
+    alarm_minutes_before = models.IntegerField(choices=ALARM_CHOICES, default=DEFAULT_ALARM_MINUTES)
+    fires_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -102,10 +416,57 @@ class AlarmSettings(models.Model):
         verbose_name_plural = 'Alarm Settings'
         unique_together = ['user', 'class_schedule']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['class_schedule', 'is_enabled'], name='alarm_sched_enabled_idx'),
+            models.Index(fields=['user', 'updated_at'], name='alarm_user_updated_idx'),
+        ]
     
     def __str__(self):
         status = "ON" if self.is_enabled else "OFF"
         return f"{self.user.email} - {self.class_schedule} - Alarm {status} ({self.alarm_minutes_before}m)"
+    
+    @classmethod
+    def for_classes(cls, user, class_schedules):
+        """Return {class id: alarm setting} for user, filling gaps with unsaved defaults."""
+        preference = AlarmPreference.for_user(user)
+        alarm_settings = {
+            alarm_setting.class_schedule_id: alarm_setting
+            for alarm_setting in cls.objects.filter(user=user, class_schedule__in=class_schedules)
+        }
+        for class_schedule in class_schedules:
+            if class_schedule.id not in alarm_settings:
+                alarm_settings[class_schedule.id] = preference.default_alarm(class_schedule)
+        return alarm_settings
+    
+    def save_override(self):
+        """Store the setting only if it differs from the user's default, otherwise drop it."""
+        preference = AlarmPreference.for_user(self.user)
+        self.refresh_fires_at()
+        
+        if (self.is_enabled, self.alarm_minutes_before) != (preference.is_enabled, preference.alarm_minutes_before):
+            self.save()
+        elif self.pk:
+            self.delete()
+    
+    def refresh_fires_at(self):
+        """Recompute the denormalized fire time from the class and offset."""
+        self.alarm_minutes_before = int(self.alarm_minutes_before)
+        
+        # One setting covers every occurrence of a recurring class
+        if self.class_schedule.is_recurring:
+            self.fires_at = None
+        else:
+            self.fires_at = self.class_schedule.starts_at - timedelta(minutes=self.alarm_minutes_before)
+    
+    def save(self, *args, **kwargs):
+        """Override save to denormalize the alarm fire time."""
+        self.refresh_fires_at()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'fires_at'}
+        
+        super().save(*args, **kwargs)
 
 
 class NotificationLog(models.Model):
@@ -120,12 +481,206 @@ class NotificationLog(models.Model):
     ])
     sent_at = models.DateTimeField(auto_now_add=True)
     message = models.TextField()
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    date = models.DateField(null=True, blank=True, help_text='Date of the class occurrence an alarm was for')
+    
+    TITLES = {
+        'alarm': 'ClassAlarm - Class Reminder',
+        'reminder': 'ClassAlarm - Reminder',
+        'test': 'ClassAlarm - Test Notification',
+    }
     
     class Meta:
         db_table = 'notification_logs'
         verbose_name = 'Notification Log'
         verbose_name_plural = 'Notification Logs'
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['user', '-sent_at'], name='notif_log_user_sent_idx'),
+            models.Index(fields=['user', 'id'], name='notif_log_user_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.notification_type} - {self.sent_at}"
+    
+    @property
+    def title(self):
+        """Return the title shown when the notification is delivered."""
+        return self.TITLES.get(self.notification_type, 'ClassAlarm')
+    
+    @property
+    def tag(self):
+        """
+        Return the tag the notification is shown under.
+        
+        An alarm's tag names its class occurrence, the same one the service
+        worker (sw.js) uses for alarms it schedules itself, so the browser
+        shows whichever arrives first and lets the other replace it quietly.
+        """
+        if self.notification_type == 'alarm' and self.date:
+            return f"alarm-{self.class_schedule_id}-{self.date.isoformat()}"
+        return f"notification-{self.id}"
+
+
+class NotificationInbox(models.Model):
+    """Model for how far a user has cleared their notification inbox."""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_inbox')
+    cleared_through = models.BigIntegerField(default=0, help_text='ID of the newest notification log cleared')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'notification_inboxes'
+        verbose_name = 'Notification Inbox'
+        verbose_name_plural = 'Notification Inboxes'
+    
+    def __str__(self):
+        return f"{self.user.email} - cleared through {self.cleared_through}"
+
+
+class AlarmPreference(models.Model):
+    """Model for a student's default alarm, used for classes without their own alarm setting."""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='alarm_preference')
+    is_enabled = models.BooleanField(default=True)
+    alarm_minutes_before = models.IntegerField(choices=AlarmSettings.ALARM_CHOICES, default=DEFAULT_ALARM_MINUTES)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'alarm_preferences'
+        verbose_name = 'Alarm Preference'
+        verbose_name_plural = 'Alarm Preferences'
+    
+    def __str__(self):
+        status = "ON" if self.is_enabled else "OFF"
+        return f"{self.user.email} - Default Alarm {status} ({self.alarm_minutes_before}m)"
+    
+    @classmethod
+    def for_user(cls, user):
+        """Return the user's preference, or an unsaved one holding the global defaults."""
+        try:
+            return user.alarm_preference
+        except cls.DoesNotExist:
+            return cls(user=user)
+    
+    def default_alarm(self, class_schedule):
+        """Return the unsaved alarm setting this preference implies for a class."""
+        alarm_setting = AlarmSettings(
+            user=self.user,
+            class_schedule=class_schedule,
+            is_enabled=self.is_enabled,
+            alarm_minutes_before=self.alarm_minutes_before
+        )
+        alarm_setting.refresh_fires_at()
+        return alarm_setting
+
+
+class AlarmDelivery(models.Model):
+    """
+    Ledger of class occurrences whose alarm has been claimed for delivery.
+    
+    Keyed on the date the class meets rather than the alarm's fire time, so
+    changing the alarm offset or the class time after delivery does not
+    send it again.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alarm_deliveries')
+    class_schedule = models.ForeignKey(ClassSchedule, on_delete=models.CASCADE, related_name='alarm_deliveries')
+    date = models.DateField(help_text='Date of the class occurrence the alarm was for')
+    claim = models.UUIDField(db_index=True, editable=False)
+    claimed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'alarm_deliveries'
+        verbose_name = 'Alarm Delivery'
+        verbose_name_plural = 'Alarm Deliveries'
+        unique_together = ['user', 'class_schedule', 'date']
+        ordering = ['-claimed_at']
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.class_schedule} - {self.date}"
+
+
+class Tombstone(models.Model):
+    """Model recording a deleted row so syncing clients can drop their copy."""
+    
+    KIND_CHOICES = [
+        ('class', 'Class Schedule'),
+        ('attachment', 'Class Attachment'),
+        ('alarm', 'Alarm Setting'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # No constraint: tombstones are written while a user's rows are being
+    # cascade-deleted, and are purged on their own schedule anyway
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='tombstones',
+        help_text='Owner of a per-user row; empty for rows every user syncs'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'sync_tombstones'
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        ordering = ['-deleted_at']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} deleted at {self.deleted_at}"
+
+
+class Task(models.Model):
+    """Model for a background task waiting for, or being run by, a task worker."""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=200, help_text='Registered name of the task function')
+    queue = models.CharField(max_length=50, default='default')
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text='Not run before this time')
+    locked_until = models.DateTimeField(null=True, blank=True, help_text='When a running task is given up as lost')
+    # Set for tasks where one queued run does the work of any number of requests
+    unique_key = models.CharField(max_length=200, null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'tasks'
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at'], name='task_status_queue_run_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'], condition=models.Q(status='queued'), name='task_unique_queued'
+            ),
+        ]
+        verbose_name = 'Task'
+        verbose_name_plural = 'Tasks'
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class TaskQueue(models.Model):
+    """Model for a task queue, whose row a worker locks while it claims the queue's tasks."""
+    
+    name = models.CharField(max_length=50, primary_key=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text='When a worker last claimed tasks from it')
+    
+    class Meta:
+        db_table = 'task_queues'
+        verbose_name = 'Task queue'
+        verbose_name_plural = 'Task queues'
+    
+    def __str__(self):
+        return self.name
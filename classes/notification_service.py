@@ -2,125 +2,510 @@
 Notification service for ClassAlarm system.
 """
 
+import asyncio
+import copy
+import hashlib
 import json
+import time
+import uuid
+from collections import defaultdict
 from datetime import datetime, timedelta
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
-from django.core.cache import cache
-from .models import ClassSchedule, AlarmSettings, NotificationLog
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .caching import STUDENT_INBOXES_NAMESPACE, get_versions, inbox_namespace, invalidate_many
+from .models import (
+    ClassSchedule, AlarmSettings, AlarmPreference, AlarmDelivery, NotificationLog, NotificationInbox,
+    DEFAULT_ALARM_MINUTES, cancelled_on
+)
+from .task_queue import run_in_thread
+
+User = get_user_model()
+
+
+# How far back a check looks for alarms that are due but not yet delivered
+ALARM_LOOKBACK = timedelta(hours=1)
+
+# Notification streams check the inbox version this often (seconds), send a keep-alive
+# after this much silence, and close after this long so clients reconnect
+NOTIFICATION_STREAM_INTERVAL = 1
+NOTIFICATION_STREAM_KEEPALIVE = 15
+NOTIFICATION_STREAM_TIMEOUT = 300
+
+# Most notification streams one process holds open. Each costs a cache read
+# every NOTIFICATION_STREAM_INTERVAL, and a pool thread and a database
+# connection for as long as a read of a changed inbox takes; clients turned
+# away poll instead
+NOTIFICATION_STREAM_LIMIT = 500
+
+# Longest a long-poll for notifications may hold a request (seconds)
+NOTIFICATION_LONG_POLL_MAX = 25
+
+# Most unacknowledged notifications returned by one inbox read
+NOTIFICATION_INBOX_LIMIT = 100
 
 
 class NotificationService:
     """Service for managing notifications and alarms."""
     
     @staticmethod
-    def check_and_send_alarms():
-        """Check for classes that need alarm notifications and send them."""
-        now = timezone.now()
+    def check_and_send_alarms(now=None):
+        """
+        Check for classes that need alarm notifications and send them.
         
-        # Get all classes happening today
-        today = now.date()
-        classes_today = ClassSchedule.objects.filter(date=today)
+        Every check scans the whole lookback window, so an alarm that was
+        already due when its class was posted or moved still goes out; the
+        delivery ledger keeps it from going out twice.
+        """
+        now = now or timezone.now()
+        start = now - ALARM_LOOKBACK
+        claim = uuid.uuid4()
         
-        notifications_sent = []
+        due_occurrences = NotificationService.get_due_occurrences(start, now)
+        due_alarms = NotificationService.get_due_alarms(start, now, due_occurrences)
+        NotificationService.send_alarm_notifications(NotificationService.claim_alarms(due_alarms, claim))
+        NotificationService.send_default_alarms(due_occurrences, claim, now)
         
-        for class_schedule in classes_today:
-            class_time = datetime.combine(today, class_schedule.time)
-            class_datetime = timezone.make_aware(class_time)
-            
-            # Get all alarm settings for this class
-            alarm_settings = AlarmSettings.objects.filter(
-                class_schedule=class_schedule,
-                is_enabled=True
+        # One summary row per class occurrence rather than one per recipient
+        sent = AlarmDelivery.objects.filter(claim=claim).values(
+            'class_schedule__subject', 'class_schedule__time', 'date'
+        ).annotate(recipients=Count('id')).order_by('class_schedule__time', 'class_schedule__subject')
+        subjects = dict(ClassSchedule.SUBJECT_CHOICES)
+        return [
+            {
+                'class': subjects.get(row['class_schedule__subject'], row['class_schedule__subject']),
+                'date': row['date'],
+                'time': row['class_schedule__time'],
+                'recipients': row['recipients'],
+            }
+            for row in sent
+        ]
+    
+    @staticmethod
+    def get_due_occurrences(start, end):
+        """
+        Return (class, occurrence, {minutes: fire time}) for each class
+        occurrence with an alarm, at any offset, due in (start, end].
+        
+        Recurring classes are expanded here; cancelled occurrences are left
+        out. Two queries: the classes and their cancellations.
+        """
+        offsets = [minutes for minutes, _label in AlarmSettings.ALARM_CHOICES]
+        classes = ClassSchedule.objects.alarm_due_between(start, end, offsets).prefetch_related('cancellations')
+        
+        due_occurrences = []
+        for class_schedule in classes:
+            occurrence_starts = class_schedule.starts_between(
+                start + timedelta(minutes=min(offsets)),
+                end + timedelta(minutes=max(offsets)),
             )
-            
-            for alarm_setting in alarm_settings:
-                alarm_time = class_datetime - timedelta(minutes=alarm_setting.alarm_minutes_before)
-                
-                # Check if it's time to send the alarm
-                if now >= alarm_time:
-                    # Check if we already sent this alarm
-                    cache_key = f"alarm_sent_{alarm_setting.id}_{alarm_time.date()}"
-                    if not cache.get(cache_key):
-                        NotificationService.send_alarm_notification(alarm_setting)
-                        cache.set(cache_key, True, 3600)  # Cache for 1 hour
-                        notifications_sent.append({
-                            'user': alarm_setting.user.email,
-                            'class': class_schedule.get_subject_display(),
-                            'time': alarm_setting.alarm_minutes_before
-                        })
-        
-        return notifications_sent
+            for starts_at in occurrence_starts:
+                fire_times = {
+                    minutes: starts_at - timedelta(minutes=minutes)
+                    for minutes in offsets
+                    if start < starts_at - timedelta(minutes=minutes) <= end
+                }
+                if fire_times:
+                    occurrence = class_schedule.as_occurrence(timezone.localdate(starts_at))
+                    due_occurrences.append((class_schedule, occurrence, fire_times))
+        return due_occurrences
     
     @staticmethod
-    def send_alarm_notification(alarm_setting):
-        """Send alarm notification to user."""
-        class_schedule = alarm_setting.class_schedule
-        user = alarm_setting.user
+    def get_due_alarms(start, end, due_occurrences=None):
+        """
+        Return undelivered, enabled alarm settings whose fire time falls in (start, end].
         
-        message = f"🔔 Class Reminder!\n{class_schedule.get_subject_display()} starts in {alarm_setting.alarm_minutes_before} minutes!\n📍 {class_schedule.get_venue_display()} at {class_schedule.time}"
+        A one-off class's setting stores its fire time. A recurring class
+        keeps one setting per student for all its occurrences, so those are
+        expanded over the due occurrences instead, as unsaved copies dated to
+        the occurrence. Cancelled occurrences get no alarm either way.
+        """
+        if due_occurrences is None:
+            due_occurrences = NotificationService.get_due_occurrences(start, end)
+        due_alarms = list(NotificationService.get_due_single_alarms(start, end))
         
-        # Log the notification
-        NotificationLog.objects.create(
-            user=user,
-            class_schedule=class_schedule,
-            notification_type='alarm',
-            message=message
+        recurring = [
+            (class_schedule, occurrence, fire_times)
+            for class_schedule, occurrence, fire_times in due_occurrences
+            if class_schedule.is_recurring
+        ]
+        if not recurring:
+            return due_alarms
+        
+        class_ids = {class_schedule.id for class_schedule, _occurrence, _fire_times in recurring}
+        overrides = defaultdict(list)
+        for alarm_setting in AlarmSettings.objects.filter(
+            class_schedule_id__in=class_ids, is_enabled=True
+        ).select_related('user'):
+            overrides[alarm_setting.class_schedule_id].append(alarm_setting)
+        delivered = set(
+            AlarmDelivery.objects.filter(
+                class_schedule_id__in=class_ids,
+                date__in={occurrence.date for _class, occurrence, _fire_times in recurring},
+            ).values_list('user_id', 'class_schedule_id', 'date')
+        )
+        
+        for class_schedule, occurrence, fire_times in recurring:
+            for alarm_setting in overrides[class_schedule.id]:
+                fires_at = fire_times.get(alarm_setting.alarm_minutes_before)
+                if fires_at is None or (alarm_setting.user_id, class_schedule.id, occurrence.date) in delivered:
+                    continue
+                alarm_setting = copy.copy(alarm_setting)
+                alarm_setting.class_schedule = occurrence
+                alarm_setting.fires_at = fires_at
+                due_alarms.append(alarm_setting)
+        return due_alarms
+    
+    @staticmethod
+    def get_due_single_alarms(start, end):
+        """Return the undelivered, enabled settings of one-off classes, not cancelled, firing in (start, end]."""
+        delivered = AlarmDelivery.objects.filter(
+            user=OuterRef('user'),
+            class_schedule=OuterRef('class_schedule'),
+            date=OuterRef('class_schedule__date'),
+        )
+        return AlarmSettings.objects.filter(
+            is_enabled=True,
+            fires_at__gt=start,
+            fires_at__lte=end,
+            class_schedule__recurrence='none',
+        ).exclude(
+            Exists(delivered)
+        ).exclude(
+            cancelled_on(OuterRef('class_schedule__date'), OuterRef('class_schedule'))
+        ).select_related('user', 'class_schedule').order_by('fires_at')
+    
+    @staticmethod
+    def send_default_alarms(due_occurrences, claim, now=None):
+        """
+        Deliver the default alarms due for due_occurrences in SQL and return how many went.
+        
+        Students only get an AlarmSettings row once they override a class, so
+        everyone else gets their AlarmPreference (or the global default). Two
+        INSERT ... SELECT statements expand due (class, date, offset) triples
+        against the students whose default is that offset, minus overrides:
+        one claims ledger rows under claim, skipping occurrences already
+        delivered, and one writes the claimed rows' inbox entries. No student
+        is loaded into Python, however many there are.
+        
+        The writes still grow with the audience: each occurrence costs one
+        ledger row and one NotificationLog row per student it alarms. The
+        ledger is purged after the lookback (purge_alarm_deliveries); the log
+        is each student's inbox. With ALARM_DEFAULTS_OPT_IN only students who
+        saved a preference get defaults, which caps both at those students.
+        
+        Defaults go to students only: the student panel is where they were
+        made, and CRs set alarms for the classes they follow themselves.
+        """
+        due = [
+            (class_schedule.id, occurrence.date, minutes, NotificationService.alarm_message(occurrence, minutes))
+            for class_schedule, occurrence, fire_times in due_occurrences
+            for minutes in fire_times
+        ]
+        if not due:
+            return 0
+        
+        now = now or timezone.now()
+        quote = connection.ops.quote_name
+        tables = {
+            'due': quote('due_alarms'),
+            'users': quote(User._meta.db_table),
+            'preferences': quote(AlarmPreference._meta.db_table),
+            'settings': quote(AlarmSettings._meta.db_table),
+            'deliveries': quote(AlarmDelivery._meta.db_table),
+            'logs': quote(NotificationLog._meta.db_table),
+            'join': 'INNER JOIN' if settings.ALARM_DEFAULTS_OPT_IN else 'LEFT JOIN',
+        }
+        due_sql = 'WITH {due} (class_schedule_id, date, minutes, message) AS (VALUES {rows}) '.format(
+            rows=', '.join(['(%s, %s, %s, %s)'] * len(due)), **tables
+        )
+        due_params = [
+            value
+            for class_schedule_id, day, minutes, message in due
+            for value in (class_schedule_id, connection.ops.adapt_datefield_value(day), minutes, message)
+        ]
+        claim = AlarmDelivery._meta.get_field('claim').get_db_prep_value(claim, connection)
+        now = connection.ops.adapt_datetimefield_value(now)
+        
+        deliveries_sql = due_sql + """
+            INSERT INTO {deliveries} (user_id, class_schedule_id, date, claim, claimed_at)
+            SELECT u.id, {due}.class_schedule_id, {due}.date, %s, %s
+            FROM {due}
+            CROSS JOIN {users} u
+            {join} {preferences} p ON p.user_id = u.id
+            WHERE u.role = 'student' AND u.is_active = %s
+                AND COALESCE(p.is_enabled, %s) = %s
+                AND COALESCE(p.alarm_minutes_before, %s) = {due}.minutes
+                AND NOT EXISTS (
+                    SELECT 1 FROM {settings} s
+                    WHERE s.user_id = u.id AND s.class_schedule_id = {due}.class_schedule_id
+                )
+            ON CONFLICT DO NOTHING
+        """.format(**tables)
+        logs_sql = due_sql + """
+            INSERT INTO {logs} (user_id, class_schedule_id, notification_type, sent_at, message, date)
+            SELECT d.user_id, d.class_schedule_id, 'alarm', %s, {due}.message, d.date
+            FROM {deliveries} d
+            INNER JOIN {due} ON {due}.class_schedule_id = d.class_schedule_id AND {due}.date = d.date
+            LEFT JOIN {preferences} p ON p.user_id = d.user_id
+            WHERE d.claim = %s AND COALESCE(p.alarm_minutes_before, %s) = {due}.minutes
+                AND NOT EXISTS (
+                    SELECT 1 FROM {settings} s
+                    WHERE s.user_id = d.user_id AND s.class_schedule_id = d.class_schedule_id
+                )
+        """.format(**tables)
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(deliveries_sql, [*due_params, claim, now, True, True, True, DEFAULT_ALARM_MINUTES])
+            cursor.execute(logs_sql, [*due_params, now, claim, DEFAULT_ALARM_MINUTES])
+            sent = cursor.rowcount
+        
+        if sent:
+            NotificationService.inbox_changed(broadcast=True)
+        return sent
+    
+    @staticmethod
+    def claim_alarms(alarm_settings, claim=None):
+        """
+        Record alarm settings in the delivery ledger under claim and return the ones claimed.
+        
+        The ledger holds one row per user and class occurrence (the class and
+        its date). Conflicting rows are ignored, so when several checkers race
+        for the same alarm only the process whose insert landed gets it back.
+        """
+        alarm_settings = list(alarm_settings)
+        if not alarm_settings:
+            return []
+        
+        claim = claim or uuid.uuid4()
+        AlarmDelivery.objects.bulk_create(
+            [
+                AlarmDelivery(
+                    user_id=alarm_setting.user_id,
+                    class_schedule_id=alarm_setting.class_schedule_id,
+                    date=alarm_setting.class_schedule.date,
+                    claim=claim,
+                )
+                for alarm_setting in alarm_settings
+            ],
+            ignore_conflicts=True,
         )
         
-        # Store notification in cache for frontend to pick up
-        cache_key = f"notification_{user.id}"
-        notifications = cache.get(cache_key, [])
-        notifications.append({
-            'id': len(notifications) + 1,
-            'type': 'alarm',
-            'title': 'ClassAlarm - Class Reminder',
-            'message': message,
-            'timestamp': timezone.now().isoformat(),
-            'class_id': class_schedule.id
-        })
-        cache.set(cache_key, notifications, 3600)  # Cache for 1 hour
+        claimed = set(
+            AlarmDelivery.objects.filter(claim=claim).values_list('user_id', 'class_schedule_id', 'date')
+        )
+        return [
+            alarm_setting for alarm_setting in alarm_settings
+            if (alarm_setting.user_id, alarm_setting.class_schedule_id, alarm_setting.class_schedule.date) in claimed
+        ]
+    
+    @staticmethod
+    def purge_deliveries(now=None):
+        """Delete ledger rows for classes met before the lookback, which no check reads again; return how many went."""
+        # An alarm due in the lookback is for a class starting after it began
+        cutoff = timezone.localdate((now or timezone.now()) - ALARM_LOOKBACK)
+        deleted, _by_model = AlarmDelivery.objects.filter(date__lt=cutoff).delete()
+        return deleted
+    
+    @staticmethod
+    def send_alarm_notification(alarm_setting):
+        """Send alarm notification to user."""
+        NotificationService.send_alarm_notifications([alarm_setting])
+    
+    @staticmethod
+    def send_alarm_notifications(alarm_settings):
+        """Send alarm notifications for a batch of alarm settings."""
+        logs = []
+        for alarm_setting in alarm_settings:
+            class_schedule = alarm_setting.class_schedule
+            message = NotificationService.alarm_message(class_schedule, alarm_setting.alarm_minutes_before)
+            
+            logs.append(NotificationLog(
+                user_id=alarm_setting.user_id,
+                class_schedule=class_schedule,
+                notification_type='alarm',
+                message=message,
+                date=class_schedule.date
+            ))
+        
+        # The log doubles as each user's inbox, so one INSERT delivers the batch
+        NotificationLog.objects.bulk_create(logs)
+        NotificationService.inbox_changed({log.user_id for log in logs})
+    
+    @staticmethod
+    def alarm_message(class_schedule, minutes):
+        """Return the text of the alarm sent minutes before class_schedule starts."""
+        return f"🔔 Class Reminder!\n{class_schedule.get_subject_display()} starts in {minutes} minutes!\n📍 {class_schedule.get_venue_display()} at {class_schedule.time}"
     
     @staticmethod
     def send_test_notification(user, class_schedule):
         """Send test notification to user."""
         message = f"🔔 Test Notification!\n{class_schedule.get_subject_display()} - This is a test notification.\n📍 {class_schedule.get_venue_display()} at {class_schedule.time}"
         
-        # Log the notification
+        # Log the notification, which also puts it in the user's inbox
         NotificationLog.objects.create(
             user=user,
             class_schedule=class_schedule,
             notification_type='test',
             message=message
         )
+        NotificationService.inbox_changed([user.id])
+    
+    @staticmethod
+    def inbox_changed(user_ids=(), broadcast=False):
+        """
+        Tell waiting streams and long-polls that these users' inboxes
+        changed, or with broadcast every student's, once the write commits.
+        """
+        namespaces = [inbox_namespace(user_id) for user_id in user_ids]
+        if broadcast:
+            namespaces.append(STUDENT_INBOXES_NAMESPACE)
+        if namespaces:
+            transaction.on_commit(lambda: invalidate_many(namespaces))
+    
+    @staticmethod
+    def get_inbox_version(user):
+        """Return the cached version of user's inbox, which changes whenever its contents might have."""
+        # Default alarms reach students in bulk, without naming each inbox
+        namespaces = [inbox_namespace(user.id)]
+        if user.is_student:
+            namespaces.append(STUDENT_INBOXES_NAMESPACE)
+        return tuple(get_versions(namespaces))
+    
+    @staticmethod
+    def get_user_notifications(user, since=0):
+        """
+        Get up to NOTIFICATION_INBOX_LIMIT pending notifications for user,
+        oldest first.
+        
+        Pending means newer than both the since cursor (the last ID the
+        client has seen) and the point the user cleared the inbox to, and not
+        yet acknowledged. A full page means more may follow; the last ID is
+        the cursor for the next one. One range scan on the (user, id) index.
+        """
+        cleared_through = NotificationInbox.objects.filter(user=user).values('cleared_through')
+        logs = NotificationLog.objects.filter(
+            user=user,
+            id__gt=since,
+            acknowledged_at__isnull=True,
+        ).filter(
+            id__gt=Coalesce(Subquery(cleared_through), 0)
+        ).order_by('id')[:NOTIFICATION_INBOX_LIMIT]
+        
+        return [
+            {
+                'id': log.id,
+                'type': log.notification_type,
+                'title': log.title,
+                'message': log.message,
+                'timestamp': log.sent_at.isoformat(),
+                'class_id': log.class_schedule_id,
+                'tag': log.tag
+            }
+            for log in logs
+        ]
+    
+    @staticmethod
+    def get_inbox_etag(notifications):
+        """Return an ETag identifying the current contents of an inbox."""
+        payload = json.dumps(notifications, sort_keys=True).encode()
+        return f'"{hashlib.md5(payload).hexdigest()}"'
+    
+    @staticmethod
+    def wait_for_notifications(user, known_etags=(), timeout=0, since=0):
+        """
+        Return (notifications, etag), waiting up to timeout seconds for the
+        inbox to differ from every ETag in known_etags.
+        
+        While waiting only the inbox version in the shared cache is checked;
+        the inbox is read again once that changes.
+        """
+        deadline = time.monotonic() + timeout
+        version = NotificationService.get_inbox_version(user)
+        while True:
+            notifications = NotificationService.get_user_notifications(user, since)
+            etag = NotificationService.get_inbox_etag(notifications)
+            if etag not in known_etags:
+                return notifications, etag
+            
+            while True:
+                if time.monotonic() >= deadline:
+                    return notifications, etag
+                time.sleep(NOTIFICATION_STREAM_INTERVAL)
+                latest = NotificationService.get_inbox_version(user)
+                if latest != version:
+                    version = latest
+                    break
+    
+    @staticmethod
+    async def stream_user_notifications(user, since=0):
+        """
+        Yield inbox entries for user as they arrive, or None as a keep-alive.
+        
+        Entries already in the inbox after since are yielded straight away.
+        After that an idle stream only reads the inbox version from the
+        shared cache, and queries the database when it changes. The generator
+        stops after NOTIFICATION_STREAM_TIMEOUT seconds.
+        """
+        # Run off the single thread sync code shares, so streams do not queue
+        # behind each other (or behind requests) for their reads, and close
+        # the connections each read opens (the version too, if the cache is
+        # in the database) rather than leave them idle on pool threads
+        get_version = sync_to_async(partial(run_in_thread, NotificationService.get_inbox_version), thread_sensitive=False)
+        get_notifications = sync_to_async(
+            partial(run_in_thread, NotificationService.get_user_notifications), thread_sensitive=False
+        )
+        started = last_yield = time.monotonic()
+        version = None
         
-        # Store notification in cache for frontend to pick up
-        cache_key = f"notification_{user.id}"
-        notifications = cache.get(cache_key, [])
-        notifications.append({
-            'id': len(notifications) + 1,
-            'type': 'test',
-            'title': 'ClassAlarm - Test Notification',
-            'message': message,
-            'timestamp': timezone.now().isoformat(),
-            'class_id': class_schedule.id
-        })
-        cache.set(cache_key, notifications, 3600)
+        while time.monotonic() - started < NOTIFICATION_STREAM_TIMEOUT:
+            latest = await get_version(user)
+            if latest != version:
+                version = latest
+                # IDs only grow, so the last one yielded is the next read's
+                # cursor; keep reading while pages come back full
+                while True:
+                    notifications = await get_notifications(user, since)
+                    for notification in notifications:
+                        since = notification['id']
+                        last_yield = time.monotonic()
+                        yield notification
+                    if len(notifications) < NOTIFICATION_INBOX_LIMIT:
+                        break
+            
+            if time.monotonic() - last_yield >= NOTIFICATION_STREAM_KEEPALIVE:
+                last_yield = time.monotonic()
+                yield None
+            
+            await asyncio.sleep(NOTIFICATION_STREAM_INTERVAL)
     
     @staticmethod
-    def get_user_notifications(user):
-        """Get pending notifications for user."""
-        cache_key = f"notification_{user.id}"
-        notifications = cache.get(cache_key, [])
-        return notifications
+    def acknowledge_notifications(user, notification_ids):
+        """Mark a batch of the user's notifications as read; return how many changed."""
+        acknowledged = NotificationLog.objects.filter(
+            user=user,
+            id__in=notification_ids,
+            acknowledged_at__isnull=True,
+        ).update(acknowledged_at=timezone.now())
+        if acknowledged:
+            NotificationService.inbox_changed([user.id])
+        return acknowledged
     
     @staticmethod
     def clear_user_notifications(user):
         """Clear all notifications for user."""
-        cache_key = f"notification_{user.id}"
-        cache.delete(cache_key)
+        # Move the inbox cursor past the newest log rather than touching each row
+        latest = NotificationLog.objects.filter(user=user).aggregate(latest=Max('id'))['latest']
+        NotificationInbox.objects.update_or_create(user=user, defaults={'cleared_through': latest or 0})
+        NotificationService.inbox_changed([user.id])
     
     @staticmethod
     def schedule_alarm_check():
-        """Schedule periodic alarm checks."""
-        # This would be called by a cron job or Celery task
-        return NotificationService.check_and_send_alarms()
+        """Queue an alarm check for a task worker; checks already waiting absorb it."""
+        from .tasks import check_alarms
+        check_alarms.enqueue()
@@ -0,0 +1,132 @@
+"""
+Pagination for class schedule list endpoints.
+"""
+
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from itertools import islice
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date, parse_time
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from .serializers import CLASS_SCHEDULE_LIST_COLUMNS
+
+
+class ClassScheduleCursorPagination(BasePagination):
+    """
+    Keyset pagination over class schedules ordered by (date, time, id).
+
+    The cursor encodes the last row of the previous page, so every page is a
+    range scan from that key however far into the timetable the client is.
+    Recurring classes are expanded into their occurrences between date_from
+    and date_to and merged into the one-off classes in key order, expanding
+    only as many weeks as the page needs.
+
+    Pages hold .values_list() rows for the columns plan rather than model
+    instances, and are rendered straight to JSON.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+    columns = CLASS_SCHEDULE_LIST_COLUMNS
+
+    def paginate_queryset(self, queryset, request, view=None, date_from=None, date_to=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        self.key_columns = [self.columns.index(lookup) for lookup in ('date', 'time', 'id')]
+
+        singles = queryset.singles().order_by('date', 'time', 'id')
+        if position is not None:
+            date, time, pk = position
+            singles = singles.filter(
+                Q(date__gt=date)
+                | Q(date=date, time__gt=time)
+                | Q(date=date, time=time, id__gt=pk)
+            )
+            if date_from is None or date > date_from:
+                date_from = date
+
+        series = queryset.filter(recurrence='weekly')
+        if date_from is not None:
+            series = series.filter(repeat_until__gte=date_from)
+
+        # Fetch one extra row to learn whether there is a next page
+        streams = [self.columns.rows(singles)[:page_size + 1]]
+        streams += [
+            self.after(rows, position)
+            for rows in series.occurrence_rows(self.columns.lookups, date_from, date_to)
+        ]
+        results = list(islice(heapq.merge(*streams, key=self.position_of), page_size + 1))
+        self.page = results[:page_size]
+        self.has_next = len(results) > page_size
+        return self.page
+
+    def after(self, rows, position):
+        """Yield the rows that sort after position."""
+        for row in rows:
+            if position is None or self.position_of(row) > position:
+                yield row
+
+    def position_of(self, row):
+        """Return the (date, time, id) key a row sorts by."""
+        return tuple(row[index] for index in self.key_columns)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(*self.position_of(self.page[-1])),
+        )
+
+    def get_paginated_content(self):
+        """Return the page as JSON bytes."""
+        return self.columns.render(self.page, next=self.get_next_link())
+
+    def get_paginated_response(self, data=None):
+        return HttpResponse(self.get_paginated_content(), content_type='application/json')
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, date, time, pk):
+        """Encode a (date, time, id) position as an opaque cursor string."""
+        raw = f"{date.isoformat()}|{time.isoformat()}|{pk}"
+        return urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Return the (date, time, id) position from the request, if any."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            date, time, pk = urlsafe_b64decode(encoded.encode()).decode().split('|')
+            position = (parse_date(date), parse_time(time), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
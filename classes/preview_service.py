@@ -0,0 +1,104 @@
+"""
+Thumbnails and first-page previews for attachment content.
+"""
+
+import logging
+from io import BytesIO
+from pathlib import PurePath
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .models import AttachmentBlob
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+
+# Bounding boxes in pixels: thumbnails for lists, previews for a closer look
+THUMBNAIL_SIZE = (256, 256)
+PREVIEW_SIZE = (1024, 1024)
+PREVIEW_QUALITY = 75
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif'}
+
+
+class PreviewService:
+    """Service for rendering attachment thumbnails and previews, run as a background task."""
+    
+    @staticmethod
+    def render_first_page(content, extension):
+        """Return the first page or frame of content, no larger than a preview, or None for other types."""
+        if extension in IMAGE_EXTENSIONS:
+            image = Image.open(content)
+            # JPEGs decode straight to a fraction of their size, far faster for photos
+            image.draft('RGB', PREVIEW_SIZE)
+            image = ImageOps.exif_transpose(image)
+        elif extension == '.pdf' and pdfium is not None:
+            pdf = pdfium.PdfDocument(content)
+            try:
+                page = pdf[0]
+                scale = min(PREVIEW_SIZE[0] / page.get_width(), PREVIEW_SIZE[1] / page.get_height())
+                image = page.render(scale=scale).to_pil()
+            finally:
+                pdf.close()
+        else:
+            return None
+        
+        image.thumbnail(PREVIEW_SIZE)
+        return image
+    
+    @staticmethod
+    def encode(image, size):
+        """Return image shrunk to fit size, as WebP."""
+        image = image.copy()
+        image.thumbnail(size)
+        transparent = 'A' in image.getbands() or 'transparency' in image.info
+        buffer = BytesIO()
+        image.convert('RGBA' if transparent else 'RGB').save(buffer, 'WEBP', quality=PREVIEW_QUALITY)
+        return ContentFile(buffer.getvalue())
+    
+    @staticmethod
+    def generate(blob_id):
+        """
+        Make the thumbnail and preview of a pending blob and return its new
+        preview status, or None if there was nothing to do.
+        
+        They are saved beside the blob's file as <sha256>.thumb.webp and
+        <sha256>.preview.webp. Content that cannot be previewed is marked
+        unsupported, and content that fails to decode is marked failed.
+        """
+        blob = AttachmentBlob.objects.filter(pk=blob_id, preview_status='pending').first()
+        if blob is None:
+            return None
+        
+        storage = blob.file.storage
+        base = str(PurePath(blob.file.name).with_suffix(''))
+        names = {'thumbnail': '', 'preview': ''}
+        try:
+            with blob.file.open('rb') as content:
+                image = PreviewService.render_first_page(content, PurePath(blob.file.name).suffix.lower())
+            if image is None:
+                status = 'unsupported'
+            else:
+                names['thumbnail'] = storage.save(f"{base}.thumb.webp", PreviewService.encode(image, THUMBNAIL_SIZE))
+                names['preview'] = storage.save(f"{base}.preview.webp", PreviewService.encode(image, PREVIEW_SIZE))
+                status = 'ready'
+        except Exception:
+            # Decoders raise all sorts on damaged or hostile files
+            logger.warning("Could not preview attachment blob %s", blob.pk, exc_info=True)
+            status = 'failed'
+        
+        updated = AttachmentBlob.objects.filter(pk=blob.pk, preview_status='pending').update(
+            preview_status=status, previewed_at=timezone.now(), **names
+        )
+        if not updated:
+            # The blob was released meanwhile, or another worker got there first
+            for name in names.values():
+                if name:
+                    storage.delete(name)
+            return None
+        return status
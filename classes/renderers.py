@@ -0,0 +1,44 @@
+"""
+JSON renderer for API responses.
+"""
+
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Render JSON with orjson when it is installed, or DRF's stdlib encoder otherwise.
+
+    The output matches JSONRenderer's compact, UTF-8 form: datetimes end in
+    'Z' for UTC and anything orjson cannot encode natively (Decimal, lazy
+    strings, querysets) goes through DRF's encoder. Indented output for the
+    browsable API and non-default JSON settings fall back to JSONRenderer.
+    """
+    # orjson renders NaN and infinity as null rather than rejecting them, so
+    # STRICT_JSON is only enforced on the fallback path
+    orjson_options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if orjson is None or indent or not (self.ensure_ascii is False and self.compact):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_default, option=self.orjson_options)
+        # Like JSONRenderer, escape the line separators JavaScript rejects in strings
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+    @staticmethod
+    def encoder_default(obj):
+        """Encode what orjson cannot, the way DRF's encoder does."""
+        return encoders.JSONEncoder().default(obj)
+
@@ -0,0 +1,125 @@
+"""
+Serving stored files, handing the bytes to the front web server where one is configured.
+"""
+
+import mimetypes
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+# Ranges served from Python are read this many bytes at a time
+RANGE_BLOCK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header asks only for bytes past the end of the file."""
+
+
+def parse_range(header, size):
+    """
+    Return the (first, last) byte positions a Range header asks for, or None
+    to send the whole file.
+
+    Only a single byte range is served; anything else is ignored, which
+    RFC 9110 allows.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            # A suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+
+    if first >= size:
+        raise RangeNotSatisfiable
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def read_range(file, first, length):
+    """Yield length bytes of file from position first, a block at a time."""
+    with file:
+        file.seek(first)
+        while length > 0:
+            block = file.read(min(RANGE_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_file(request, field_file, size, filename, etag, last_modified, as_attachment=False):
+    """
+    Return a response for a stored file of size bytes, honouring conditional
+    and Range requests; filename sets the content type and disposition.
+
+    With SENDFILE_BACKEND set the response carries no body, only a header
+    telling the front server which file to send, so a download costs the
+    worker no more than the permission check did. Otherwise the file is
+    streamed from Python.
+    """
+    last_modified = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response['ETag'] = etag
+        return response
+
+    backend = settings.SENDFILE_BACKEND
+    if backend == 'nginx':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.SENDFILE_URL_PREFIX.rstrip('/') + '/' + quote(field_file.name)
+    elif backend == 'xsendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = field_file.path
+    elif backend:
+        raise ImproperlyConfigured(f"Unknown SENDFILE_BACKEND {backend!r}; use 'nginx', 'xsendfile' or ''")
+    else:
+        response = serve_from_python(request, field_file, size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    patch_cache_control(response, private=True, max_age=86400)
+    return response
+
+
+def serve_from_python(request, field_file, size, etag, last_modified):
+    """Stream a file, or the single range of it the request asks for."""
+    # A stale If-Range means the client's partial copy is of other content
+    if_range = request.headers.get('If-Range')
+    range_header = request.headers.get('Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(field_file.open('rb'))
+
+    first, last = byte_range
+    length = last - first + 1
+    response = StreamingHttpResponse(read_range(field_file.open('rb'), first, length), status=206)
+    response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    response['Content-Length'] = str(length)
+    return response
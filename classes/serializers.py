@@ -1,18 +1,76 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import ClassSchedule, ClassAttachment, AlarmSettings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.urls import reverse
+from . import columnar
+from .models import ClassSchedule, ClassAttachment, AttachmentUpload, AlarmSettings, AlarmPreference
 
 User = get_user_model()
 
 
+def _validate_recurrence(attrs, instance=None):
+    """Check the recurrence rule, falling back to instance for fields a partial update leaves out."""
+    def current(field):
+        return attrs.get(field, getattr(instance, field, None))
+    
+    recurrence = current('recurrence') or 'none'
+    if recurrence == 'none':
+        if 'repeat_until' in attrs or 'recurrence' in attrs:
+            attrs['repeat_until'] = None
+        return attrs
+    
+    repeat_until = current('repeat_until')
+    if not repeat_until:
+        raise serializers.ValidationError({'repeat_until': 'Weekly classes need a last date.'})
+    if current('date') and repeat_until < current('date'):
+        raise serializers.ValidationError({'repeat_until': 'The last date cannot be before the first class.'})
+    return attrs
+
+
 class ClassAttachmentSerializer(serializers.ModelSerializer):
     """Serializer for class attachments."""
     file_size_mb = serializers.ReadOnlyField()
+    download_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     
     class Meta:
         model = ClassAttachment
-        fields = ['id', 'file', 'original_filename', 'file_size', 'file_size_mb', 'uploaded_at']
+        fields = [
+            'id', 'file', 'download_url', 'thumbnail_url', 'preview_url',
+            'original_filename', 'file_size', 'file_size_mb', 'uploaded_at'
+        ]
         read_only_fields = ['id', 'file_size', 'uploaded_at']
+    
+    def get_download_url(self, obj):
+        """Get the authenticated download URL, absolute when there is a request."""
+        return self._absolute_url(reverse('attachment-download', args=[obj.pk]))
+    
+    def get_thumbnail_url(self, obj):
+        """Get the authenticated URL of a small image of the file, or None until one is made."""
+        if obj.blob is None or not obj.blob.thumbnail:
+            return None
+        return self._absolute_url(reverse('attachment-download', args=[obj.pk]) + '?variant=thumbnail')
+    
+    def get_preview_url(self, obj):
+        """Get the authenticated URL of a larger image of the file's first page, or None until one is made."""
+        if obj.blob is None or not obj.blob.preview:
+            return None
+        return self._absolute_url(reverse('attachment-download', args=[obj.pk]) + '?variant=preview')
+    
+    def _absolute_url(self, url):
+        """Make url absolute when there is a request to take the host from."""
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ClassAttachmentSyncSerializer(ClassAttachmentSerializer):
+    """Serializer for class attachments sent to syncing clients."""
+    
+    class Meta(ClassAttachmentSerializer.Meta):
+        fields = ClassAttachmentSerializer.Meta.fields + ['class_schedule']
 
 
 class ClassScheduleSerializer(serializers.ModelSerializer):
@@ -24,10 +82,14 @@ class ClassScheduleSerializer(serializers.ModelSerializer):
         model = ClassSchedule
         fields = [
             'id', 'created_by', 'subject', 'venue', 'date', 'time', 
-            'note', 'attachments', 'created_at', 'updated_at'
+            'recurrence', 'repeat_until', 'note', 'attachments', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
     
+    def validate(self, attrs):
+        """Validate the recurrence rule."""
+        return _validate_recurrence(attrs, self.instance)
+    
     def create(self, validated_data):
         """Create class schedule with current user as creator."""
         validated_data['created_by'] = self.context['request'].user
@@ -39,7 +101,11 @@ class ClassScheduleCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ClassSchedule
-        fields = ['subject', 'venue', 'date', 'time', 'note']
+        fields = ['subject', 'venue', 'date', 'time', 'recurrence', 'repeat_until', 'note']
+    
+    def validate(self, attrs):
+        """Validate the recurrence rule."""
+        return _validate_recurrence(attrs)
     
     def create(self, validated_data):
         """Create class schedule with current user as creator."""
@@ -56,14 +122,47 @@ class ClassScheduleListSerializer(serializers.ModelSerializer):
         model = ClassSchedule
         fields = [
             'id', 'created_by', 'subject', 'venue', 'date', 'time', 
-            'note', 'attachment_count', 'created_at', 'updated_at'
+            'recurrence', 'repeat_until', 'note', 'attachment_count', 'created_at', 'updated_at'
         ]
     
     def get_attachment_count(self, obj):
         """Get count of attachments for this class."""
+        # Querysets built with ClassSchedule.objects.for_list() carry the count
+        if hasattr(obj, 'attachment_count'):
+            return obj.attachment_count
         return obj.attachments.count()
 
 
+# The fields of ClassScheduleListSerializer, read from .values_list() rows by
+# the list endpoints; keep the two in step
+CLASS_SCHEDULE_LIST_COLUMNS = columnar.ColumnarSerializer([
+    ('id', ['id'], columnar.number),
+    ('created_by', ['created_by__email', 'created_by__role'], lambda email, role: columnar.string(f"{email} ({role})")),
+    ('subject', ['subject'], columnar.string),
+    ('venue', ['venue'], columnar.string),
+    ('date', ['date'], columnar.iso_date),
+    ('time', ['time'], columnar.iso_date),
+    ('recurrence', ['recurrence'], columnar.string),
+    ('repeat_until', ['repeat_until'], columnar.iso_date),
+    ('note', ['note'], columnar.string),
+    ('attachment_count', ['attachment_count'], columnar.number),
+    ('created_at', ['created_at'], columnar.iso_datetime),
+    ('updated_at', ['updated_at'], columnar.iso_datetime),
+])
+
+
+class ClassScheduleSyncSerializer(ClassScheduleListSerializer):
+    """Serializer for class schedules sent to syncing clients, which expand recurrences themselves."""
+    cancelled_dates = serializers.SerializerMethodField()
+    
+    class Meta(ClassScheduleListSerializer.Meta):
+        fields = ClassScheduleListSerializer.Meta.fields + ['cancelled_dates']
+    
+    def get_cancelled_dates(self, obj):
+        """Get the dates of cancelled occurrences."""
+        return [cancellation.date for cancellation in obj.cancellations.all()]
+
+
 class ClassAttachmentCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating class attachments."""
     
@@ -72,12 +171,38 @@ class ClassAttachmentCreateSerializer(serializers.ModelSerializer):
         fields = ['file']
     
     def create(self, validated_data):
-        """Create attachment with metadata."""
+        """Create attachment with metadata, storing the file only if its content is new."""
+        from .attachment_service import AttachmentService
         file = validated_data['file']
-        validated_data['original_filename'] = file.name
-        validated_data['file_size'] = file.size
-        validated_data['class_schedule_id'] = self.context['class_schedule_id']
-        return super().create(validated_data)
+        return AttachmentService.attach(validated_data['class_schedule'], file, file.name)
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable attachment uploads."""
+    offset = serializers.IntegerField(source='received', read_only=True)
+    sha256 = serializers.RegexField(r'^[0-9a-f]{64}$', write_only=True, required=False)
+    
+    class Meta:
+        model = AttachmentUpload
+        fields = ['id', 'original_filename', 'file_size', 'sha256', 'offset', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_original_filename(self, value):
+        """Apply the attachment file field's validators (allowed extensions) to the name."""
+        for validator in ClassAttachment._meta.get_field('file').validators:
+            try:
+                validator(File(None, name=value))
+            except DjangoValidationError as error:
+                raise serializers.ValidationError(error.messages)
+        return value
+    
+    def validate_file_size(self, value):
+        """Check the declared size against the attachment size limit."""
+        if value < 1:
+            raise serializers.ValidationError('Attachments cannot be empty.')
+        if value > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(f'Attachments can be at most {settings.ATTACHMENT_MAX_SIZE} bytes.')
+        return value
 
 
 class AlarmSettingsSerializer(serializers.ModelSerializer):
@@ -85,8 +210,8 @@ class AlarmSettingsSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = AlarmSettings
-        fields = ['id', 'is_enabled', 'alarm_minutes_before', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'is_enabled', 'alarm_minutes_before', 'fires_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'fires_at', 'created_at', 'updated_at']
     
     def create(self, validated_data):
         """Create alarm setting with current user."""
@@ -94,9 +219,25 @@ class AlarmSettingsSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class AlarmSettingsSyncSerializer(AlarmSettingsSerializer):
+    """Serializer for alarm settings sent to syncing clients."""
+    
+    class Meta(AlarmSettingsSerializer.Meta):
+        fields = AlarmSettingsSerializer.Meta.fields + ['class_schedule']
+
+
 class AlarmSettingsUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating alarm settings."""
     
     class Meta:
         model = AlarmSettings
         fields = ['is_enabled', 'alarm_minutes_before']
+
+
+class AlarmPreferenceSerializer(serializers.ModelSerializer):
+    """Serializer for a user's default alarm preference."""
+    
+    class Meta:
+        model = AlarmPreference
+        fields = ['is_enabled', 'alarm_minutes_before', 'updated_at']
+        read_only_fields = ['updated_at']
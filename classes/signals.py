@@ -0,0 +1,56 @@
+"""
+Signal handlers that keep caches, sync tombstones and stored files in step
+with the database.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import CLASSES_NAMESPACE, alarms_namespace, invalidate
+from .models import (
+    ClassSchedule, ClassAttachment, ClassCancellation, AttachmentUpload, AlarmSettings, AlarmPreference, Tombstone
+)
+from .attachment_service import AttachmentService
+from .upload_service import UploadService
+
+
+@receiver([post_save, post_delete], sender=ClassSchedule)
+@receiver([post_save, post_delete], sender=ClassAttachment)
+@receiver([post_save, post_delete], sender=ClassCancellation)
+def invalidate_class_lists(sender, **kwargs):
+    """A class change can show up in any class list or timetable."""
+    invalidate(CLASSES_NAMESPACE)
+
+
+@receiver([post_save, post_delete], sender=AlarmSettings)
+@receiver([post_save, post_delete], sender=AlarmPreference)
+def invalidate_user_alarms(sender, instance, **kwargs):
+    """An alarm change only shows up in its owner's timetable."""
+    invalidate(alarms_namespace(instance.user_id))
+
+
+@receiver(post_delete, sender=ClassSchedule)
+@receiver(post_delete, sender=ClassAttachment)
+@receiver(post_delete, sender=AlarmSettings)
+def record_tombstone(sender, instance, **kwargs):
+    """Remember the deletion so syncing clients can drop their copy."""
+    kind = {ClassSchedule: 'class', ClassAttachment: 'attachment', AlarmSettings: 'alarm'}[sender]
+    Tombstone.objects.create(
+        kind=kind,
+        object_id=instance.pk,
+        user_id=instance.user_id if sender is AlarmSettings else None,
+    )
+
+
+@receiver(post_delete, sender=AttachmentUpload)
+def discard_upload_part(sender, instance, **kwargs):
+    """Remove an upload's partial file however the upload goes, including with its class, once that commits."""
+    part_path = UploadService.part_path(instance)
+    transaction.on_commit(lambda: part_path.unlink(missing_ok=True))
+
+
+@receiver(post_delete, sender=ClassAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    """Drop the attachment's reference on its content, deleting the bytes once unused."""
+    if instance.blob_id:
+        AttachmentService.release(instance.blob_id)
@@ -0,0 +1,90 @@
+"""
+Delta sync service for offline-capable clients.
+"""
+
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import ClassSchedule, ClassAttachment, AlarmSettings, AlarmPreference, Tombstone
+from .serializers import (
+    ClassScheduleSyncSerializer,
+    ClassAttachmentSyncSerializer,
+    AlarmSettingsSyncSerializer,
+    AlarmPreferenceSerializer
+)
+
+
+# Re-send rows changed slightly before the token to cover writes that were
+# still in flight when it was issued; clients apply changes idempotently
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# How long deletions are remembered; older tokens get a full sync instead
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+class InvalidSyncToken(ValueError):
+    """Raised when a client sends a sync token the server did not issue."""
+
+
+class SyncService:
+    """Service for computing what changed for a user since their last sync."""
+    
+    @staticmethod
+    def get_changes(user, token=None):
+        """
+        Return everything created, updated or deleted since token.
+        
+        Without a token, or with one older than the tombstone retention, the
+        response is a full sync: every current row and no deletions, flagged
+        with "full" so the client replaces its copy.
+        """
+        now = timezone.now()
+        since = SyncService.parse_token(token) if token else None
+        full = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+        
+        classes = ClassSchedule.objects.for_list().prefetch_related('cancellations')
+        attachments = ClassAttachment.objects.select_related('blob')
+        alarm_settings = AlarmSettings.objects.filter(user=user)
+        preference = AlarmPreference.for_user(user)
+        
+        changes = {'token': now.isoformat(), 'full': full}
+        if not full:
+            since -= SYNC_OVERLAP
+            classes = classes.filter(updated_at__gt=since)
+            # Previews are made after upload, so an attachment changes when they appear
+            attachments = attachments.filter(Q(uploaded_at__gt=since) | Q(blob__previewed_at__gt=since))
+            alarm_settings = alarm_settings.filter(updated_at__gt=since)
+            if preference.pk is None or preference.updated_at <= since:
+                preference = None
+        
+        changes['classes'] = ClassScheduleSyncSerializer(classes.order_by('id'), many=True).data
+        changes['attachments'] = ClassAttachmentSyncSerializer(attachments.order_by('id'), many=True).data
+        changes['alarm_settings'] = AlarmSettingsSyncSerializer(alarm_settings.order_by('id'), many=True).data
+        changes['alarm_preference'] = AlarmPreferenceSerializer(preference).data if preference else None
+        changes['deleted'] = {kind: [] for kind, _label in Tombstone.KIND_CHOICES}
+        
+        if not full:
+            tombstones = Tombstone.objects.filter(
+                Q(user__isnull=True) | Q(user=user),
+                deleted_at__gt=since,
+            ).values_list('kind', 'object_id')
+            for kind, object_id in tombstones:
+                changes['deleted'][kind].append(object_id)
+        
+        return changes
+    
+    @staticmethod
+    def parse_token(token):
+        """Return the time a sync token was issued."""
+        issued_at = parse_datetime(token)
+        if issued_at is None or timezone.is_naive(issued_at):
+            raise InvalidSyncToken(token)
+        return issued_at
+    
+    @staticmethod
+    def purge_tombstones():
+        """Delete tombstones no token can still ask for; return how many went."""
+        cutoff = timezone.now() - SYNC_TOMBSTONE_RETENTION - SYNC_OVERLAP
+        deleted, _by_model = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        return deleted
@@ -0,0 +1,260 @@
+"""
+A small background task queue.
+
+Functions are registered with @task and queued with .enqueue(**kwargs); the
+broker named by the TASK_BROKER setting decides where they run.
+"""
+
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Task, TaskQueue
+
+logger = logging.getLogger(__name__)
+
+
+# A running task is claimed for this long; if its worker dies, the task is
+# retried once the lease runs out
+TASK_LEASE = timedelta(minutes=10)
+
+# A failed task is retried after this delay, doubled for each further attempt
+TASK_RETRY_DELAY = timedelta(seconds=30)
+
+# Registered tasks by name
+TASKS = {}
+
+_brokers = {}
+
+
+class TaskDefinition:
+    """A function that can run in the background, with where and how often to try it."""
+
+    def __init__(self, func, name, queue, max_attempts, unique):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def __repr__(self):
+        return f"<task {self.name}>"
+
+    def enqueue(self, **kwargs):
+        """Queue a run with kwargs, which must be JSON-serializable; it starts once the current transaction commits."""
+        get_broker().enqueue(self, kwargs)
+
+
+def task(queue='default', max_attempts=3, unique=False, name=None):
+    """
+    Register a function as a background task.
+
+    Tasks in a queue share its concurrency limit (TASK_QUEUE_LIMITS). A
+    unique task is queued at most once at a time, so asking again while a
+    run is waiting is free.
+    """
+    def register(func):
+        definition = TaskDefinition(func, name or f"{func.__module__}.{func.__name__}", queue, max_attempts, unique)
+        TASKS[definition.name] = definition
+        return definition
+    return register
+
+
+def get_broker():
+    """Return the broker named by the TASK_BROKER setting."""
+    path = settings.TASK_BROKER
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def retry_delay(attempts):
+    """Return how long to wait before trying a task again after attempts have failed."""
+    return TASK_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def run_in_thread(func, *args):
+    """Call func on a thread outside the request cycle, closing the database connections it opens."""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+class DatabaseBroker:
+    """Broker that stores tasks in the database for run_task_worker to run."""
+
+    def enqueue(self, definition, kwargs):
+        """
+        Insert a task row in the current transaction.
+
+        A task queued by work that rolls back is never run, and one queued by
+        work that commits is never lost.
+        """
+        task = Task(
+            name=definition.name,
+            queue=definition.queue,
+            kwargs=kwargs,
+            max_attempts=definition.max_attempts,
+            unique_key=definition.name if definition.unique else None,
+        )
+        try:
+            with transaction.atomic():
+                task.save()
+        except IntegrityError:
+            # The same unique task is already waiting, and that run will do
+            pass
+
+    def claim(self, queues, limit):
+        """
+        Claim up to limit due tasks from queues, in the order given, and return them.
+
+        No queue gets more tasks running, across all workers, than its
+        TASK_QUEUE_LIMITS entry allows. A worker claims from a queue inside a
+        transaction that first updates the queue's TaskQueue row, so workers
+        claiming from the same queue take turns: each counts the running
+        tasks only once the one before it has committed its claims. Due tasks
+        are read with SELECT ... FOR UPDATE SKIP LOCKED where the database has
+        it, passing over any a worker is settling at that moment.
+        """
+        now = timezone.now()
+        self.recover_expired(now)
+
+        claimed = []
+        for queue in queues:
+            slots = limit - len(claimed)
+            if slots <= 0:
+                break
+            claimed += self.claim_from(queue, settings.TASK_QUEUE_LIMITS.get(queue, limit), slots, now)
+        return claimed
+
+    def claim_from(self, queue, queue_limit, slots, now):
+        """Claim up to slots due tasks from queue, keeping its running tasks within queue_limit, and return them."""
+        TaskQueue.objects.get_or_create(name=queue)
+        with transaction.atomic():
+            # The update holds the row's lock until commit; on SQLite it takes
+            # the database's write lock, which serializes claims the same way
+            TaskQueue.objects.filter(name=queue).update(claimed_at=now)
+            slots = min(slots, queue_limit - self.running_counts([queue]).get(queue, 0))
+            if slots <= 0:
+                return []
+            due = Task.objects.select_for_update(skip_locked=True).filter(
+                status='queued', queue=queue, run_at__lte=now
+            ).order_by('run_at', 'id')
+            tasks = list(due[:slots])
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).update(
+                status='running', attempts=F('attempts') + 1, locked_until=now + TASK_LEASE, updated_at=now
+            )
+        for task in tasks:
+            task.status = 'running'
+            task.attempts += 1
+        return tasks
+
+    def running_counts(self, queues):
+        """Return how many tasks are running in each of queues."""
+        return dict(
+            Task.objects.filter(status='running', queue__in=queues).values_list('queue').annotate(count=Count('id'))
+        )
+
+    def execute(self, task):
+        """Run a claimed task, deleting it when it succeeds and scheduling a retry when it fails."""
+        definition = TASKS.get(task.name)
+        try:
+            if definition is None:
+                raise LookupError(f"No task is registered as {task.name!r}")
+            definition(**task.kwargs)
+        except Exception:
+            logger.exception("Task %s (%s) failed on attempt %s", task.pk, task.name, task.attempts)
+            self.fail(task, traceback.format_exc())
+        else:
+            # Only while this worker still holds the claim: a task whose lease
+            # ran out may have been retried and claimed by another worker
+            Task.objects.filter(pk=task.pk, status='running', attempts=task.attempts).delete()
+
+    def fail(self, task, error):
+        """Queue a failed task again after its retry delay, or mark it failed once out of attempts."""
+        now = timezone.now()
+        # Only the worker holding the current claim may record the outcome
+        current = Task.objects.filter(pk=task.pk, status='running', attempts=task.attempts)
+        if task.attempts >= task.max_attempts:
+            current.update(status='failed', last_error=error, locked_until=None, updated_at=now)
+            return
+
+        try:
+            with transaction.atomic():
+                current.update(
+                    status='queued', run_at=now + retry_delay(task.attempts), last_error=error, locked_until=None,
+                    updated_at=now,
+                )
+        except IntegrityError:
+            # A new run of this unique task was queued meanwhile and replaces the retry
+            current.delete()
+
+    def recover_expired(self, now):
+        """Give up on running tasks whose worker let the lease run out, counting it as a failed attempt."""
+        for task in Task.objects.filter(status='running', locked_until__lt=now):
+            self.fail(task, 'The worker running this task stopped before it finished.')
+
+
+class LocalBroker:
+    """
+    Broker that runs tasks on threads in the web process, for development
+    without a task worker.
+
+    Each queue gets its own thread pool sized by TASK_QUEUE_LIMITS. Tasks
+    waiting to run or retry are lost if the process exits.
+    """
+
+    def __init__(self):
+        self.executors = {}
+        self.waiting = set()
+        self.lock = threading.Lock()
+
+    def executor(self, queue):
+        """Return the thread pool for queue, starting it on first use."""
+        with self.lock:
+            if queue not in self.executors:
+                self.executors[queue] = ThreadPoolExecutor(
+                    max_workers=settings.TASK_QUEUE_LIMITS.get(queue, 2), thread_name_prefix=f"tasks-{queue}"
+                )
+            return self.executors[queue]
+
+    def enqueue(self, definition, kwargs):
+        """Submit the task to its queue's threads once the current transaction commits."""
+        transaction.on_commit(lambda: self.submit(definition, kwargs, 1))
+
+    def submit(self, definition, kwargs, attempt):
+        """Hand a task to its queue's threads, unless it is unique and a run is already waiting."""
+        if definition.unique and attempt == 1:
+            with self.lock:
+                if definition.name in self.waiting:
+                    return
+                self.waiting.add(definition.name)
+        self.executor(definition.queue).submit(run_in_thread, self.execute, definition, kwargs, attempt)
+
+    def execute(self, definition, kwargs, attempt):
+        """Run a task, retrying it on a timer when it fails."""
+        if definition.unique:
+            with self.lock:
+                self.waiting.discard(definition.name)
+        try:
+            definition(**kwargs)
+        except Exception:
+            logger.exception("Task %s failed on attempt %s", definition.name, attempt)
+            if attempt < definition.max_attempts:
+                delay = retry_delay(attempt).total_seconds()
+                timer = threading.Timer(delay, self.submit, args=(definition, kwargs, attempt + 1))
+                # A pending retry must not keep the process from exiting
+                timer.daemon = True
+                timer.start()
@@ -0,0 +1,33 @@
+"""
+Background tasks for the classes app, run off the request path by the
+broker configured in TASK_BROKER.
+"""
+
+from django.contrib.auth import get_user_model
+from .models import ClassSchedule
+from .notification_service import NotificationService
+from .preview_service import PreviewService
+from .task_queue import task
+
+User = get_user_model()
+
+
+@task(queue='alarms', unique=True)
+def check_alarms():
+    """Send every alarm that is due; one queued check covers any number of requests for it."""
+    NotificationService.check_and_send_alarms()
+
+
+@task(queue='notifications')
+def send_test_notification(user_id, class_schedule_id):
+    """Send a test notification, unless the user or class has been deleted since it was asked for."""
+    user = User.objects.filter(pk=user_id).first()
+    class_schedule = ClassSchedule.objects.filter(pk=class_schedule_id).first()
+    if user and class_schedule:
+        NotificationService.send_test_notification(user, class_schedule)
+
+
+@task(queue='attachments')
+def generate_attachment_previews(blob_id):
+    """Make the thumbnail and preview of newly stored attachment content."""
+    PreviewService.generate(blob_id)
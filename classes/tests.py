@@ -0,0 +1,820 @@
+"""
+Tests for the classes app.
+"""
+
+import tempfile
+from pathlib import Path
+from datetime import date, timedelta
+from unittest import mock
+from io import BytesIO
+from PIL import Image
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from users.models import User
+from .attachment_service import AttachmentService
+from .models import ClassSchedule, ClassAttachment, ClassCancellation, AttachmentBlob, AttachmentUpload, AlarmSettings, AlarmPreference, AlarmDelivery, NotificationLog, Task, TaskQueue, DEFAULT_ALARM_MINUTES
+from .serializers import CLASS_SCHEDULE_LIST_COLUMNS, ClassScheduleListSerializer
+from .caching import CLASSES_NAMESPACE, get_versions, inbox_namespace, invalidate
+from .notification_service import NotificationService, NOTIFICATION_INBOX_LIMIT
+from .preview_service import PreviewService
+from .task_queue import DatabaseBroker, run_in_thread
+from .timetable_service import TimetableService
+from .upload_service import UploadService
+
+
+# Tests get a private cache and never start background threads
+TEST_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'TASK_BROKER': 'classes.task_queue.DatabaseBroker',
+}
+
+
+def create_user(email, role='student'):
+    """Create a user with the given role."""
+    user = User.objects.create_user(email=email, username=email.split('@')[0], password='x')
+    if role != user.role:
+        User.objects.filter(pk=user.pk).update(role=role)
+        user.refresh_from_db()
+    return user
+
+
+def create_classes(created_by, count, start=None):
+    """Create count classes from start (default today), four a day with two at each time."""
+    start = start or timezone.localdate()
+    return ClassSchedule.objects.bulk_create(
+        ClassSchedule(
+            created_by=created_by,
+            subject='se221',
+            venue='acb-lh1',
+            date=start + timedelta(days=i // 4),
+            time=f'{9 + i % 2}:00',
+        )
+        for i in range(count)
+    )
+
+
+@override_settings(**TEST_SETTINGS)
+class ClassListQueryCountTests(TestCase):
+    """The class list endpoints take the same few queries however many classes there are."""
+
+    URLS = ['/api/classes/', '/api/classes/today/', '/api/classes/upcoming/', '/api/classes/my-classes/']
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        for count in (3, 40):
+            ClassSchedule.objects.all().delete()
+            create_classes(self.cr, count)
+            cache.clear()
+            for url in self.URLS:
+                with self.subTest(url=url, classes=count):
+                    # A count or the keyset page, then the rows
+                    with self.assertNumQueries(2):
+                        response = self.client.get(url, {'page_size': 100})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(response.json()['results'])
+
+    def test_cached_page_takes_no_queries(self):
+        create_classes(self.cr, 10)
+        self.client.get('/api/classes/upcoming/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/classes/upcoming/')
+
+
+@override_settings(**TEST_SETTINGS)
+class CacheInvalidationTests(TestCase):
+    """Cached class lists and timetables are retired by the changes they depend on, and only those."""
+
+    def setUp(self):
+        cache.clear()
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.students = [create_user(f'student{i}@giki.edu.pk') for i in range(2)]
+        self.class_schedule = create_classes(self.cr, 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+
+    def test_class_changes_retire_cached_lists(self):
+        self.assertEqual(self.client.get('/api/classes/').json()['count'], 1)
+        ClassSchedule.objects.create(
+            created_by=self.cr, subject='cs221', venue='acb-lh1', date=timezone.localdate(), time='11:00'
+        )
+        self.assertEqual(self.client.get('/api/classes/').json()['count'], 2)
+
+        def venues():
+            return {row['venue'] for row in self.client.get('/api/classes/today/').json()['results']}
+        self.assertEqual(venues(), {'acb-lh1'})
+        self.class_schedule.venue = 'acb-lh2'
+        self.class_schedule.save()
+        self.assertEqual(venues(), {'acb-lh1', 'acb-lh2'})
+
+    def test_alarm_changes_retire_only_their_owners_timetable(self):
+        owner, other = self.students
+        TimetableService.get_timetable(owner)
+        TimetableService.get_timetable(other)
+
+        AlarmSettings.objects.create(user=owner, class_schedule=self.class_schedule, alarm_minutes_before=45)
+        [entry] = TimetableService.get_timetable(owner)['today']
+        self.assertEqual(entry['alarm']['alarm_minutes_before'], 45)
+        with self.assertNumQueries(0):
+            TimetableService.get_timetable(other)
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        before = get_versions([CLASSES_NAMESPACE])
+        cache.delete(f'cache_version_{CLASSES_NAMESPACE}')
+        invalidate(CLASSES_NAMESPACE)
+        self.assertNotEqual(get_versions([CLASSES_NAMESPACE]), before)
+
+
+@override_settings(**TEST_SETTINGS)
+class CursorPaginationTests(TestCase):
+    """Keyset pages cover every occurrence once, including classes that share a start time."""
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+
+    def test_pages_cover_every_class_once(self):
+        ids = [class_schedule.id for class_schedule in create_classes(self.cr, 11)]
+        seen = []
+        url = '/api/classes/upcoming/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 3)
+            seen += [row['id'] for row in page['results']]
+            url = page['next']
+        self.assertEqual(sorted(seen), sorted(ids))
+
+    def test_date_range_and_bad_cursor(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        create_classes(self.cr, 8)
+        page = self.client.get('/api/classes/upcoming/', {'date_from': tomorrow, 'date_to': tomorrow}).json()
+        self.assertEqual(len(page['results']), 4)
+        self.assertEqual(self.client.get('/api/classes/upcoming/', {'cursor': 'zzz'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/classes/upcoming/', {'date_to': 'bad'}).status_code, 400)
+
+
+@override_settings(**TEST_SETTINGS)
+class NotificationInboxTests(TestCase):
+    """The notification inbox pages forward, answers 304 while unchanged and long-polls for changes."""
+
+    url = '/api/classes/notifications/'
+
+    def setUp(self):
+        self.student = create_user('student@giki.edu.pk')
+        self.class_schedule = create_classes(create_user('cr@giki.edu.pk', role='cr'), 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def notify(self, message='Class soon'):
+        NotificationLog.objects.create(
+            user=self.student, class_schedule=self.class_schedule, notification_type='alarm', message=message
+        )
+        invalidate(inbox_namespace(self.student.id))
+
+    def test_unchanged_inbox_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.notify()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_long_poll_returns_once_inbox_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        # The notification arrives while the request is waiting
+        with mock.patch('classes.notification_service.time.sleep', side_effect=lambda seconds: self.notify()) as sleep:
+            response = self.client.get(self.url, {'wait': 20}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([n['message'] for n in response.json()['notifications']], ['Class soon'])
+
+    def test_long_poll_times_out_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with mock.patch('classes.notification_service.time.monotonic', side_effect=[0, 0, 30]):
+            with mock.patch('classes.notification_service.time.sleep') as sleep:
+                response = self.client.get(self.url, {'wait': 20}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        sleep.assert_called_once()
+
+    def test_stream_reads_close_their_connections(self):
+        async def first_entry():
+            async for notification in NotificationService.stream_user_notifications(self.student):
+                return notification
+
+        entry = {'id': 1, 'message': 'Class soon'}
+        with mock.patch('classes.notification_service.run_in_thread', wraps=run_in_thread) as run, \
+                mock.patch.object(NotificationService, 'get_user_notifications', return_value=[entry]) as read:
+            self.assertEqual(async_to_sync(first_entry)(), entry)
+        self.assertEqual([call.args[0] for call in run.call_args_list], [NotificationService.get_inbox_version, read])
+
+    def test_streams_past_the_limit_fall_back_to_polling(self):
+        with mock.patch('classes.notification_service.NOTIFICATION_STREAM_LIMIT', 0):
+            response = async_to_sync(AsyncClient().get)(self.url + 'stream/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_pages_forward_from_cursor(self):
+        NotificationLog.objects.bulk_create(
+            NotificationLog(user=self.student, class_schedule=self.class_schedule, notification_type='alarm', message=str(i))
+            for i in range(NOTIFICATION_INBOX_LIMIT + 5)
+        )
+        first = self.client.get(self.url).json()
+        self.assertTrue(first['has_more'])
+        second = self.client.get(self.url, {'since': first['cursor']}).json()
+        self.assertFalse(second['has_more'])
+        ids = [n['id'] for n in first['notifications'] + second['notifications']]
+        self.assertEqual(ids, sorted(NotificationLog.objects.values_list('id', flat=True)))
+
+
+@override_settings(**TEST_SETTINGS)
+class RecurrenceTests(TestCase):
+    """Weekly classes expand into occurrences, and cancelled ones are hidden everywhere."""
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.student = create_user('student@giki.edu.pk')
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+        self.today = date.today()
+
+    def create_class(self, day, time='09:00', **fields):
+        return ClassSchedule.objects.create(
+            created_by=self.cr, subject='se221', venue='acb-lh1', date=day, time=time, **fields
+        )
+
+    def cancel(self, class_schedule, day):
+        response = self.client.post(f'/api/classes/{class_schedule.id}/cancel-occurrence/', {'date': day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+
+    def listed_ids(self, url, **params):
+        return [row['id'] for row in self.client.get(url, params).json()['results']]
+
+    def test_occurrence_dates(self):
+        weekly = self.create_class(self.today, recurrence='weekly', repeat_until=self.today + timedelta(weeks=3))
+        ClassCancellation.objects.create(class_schedule=weekly, date=self.today + timedelta(weeks=1))
+        self.assertEqual(
+            list(weekly.occurrence_dates()),
+            [self.today, self.today + timedelta(weeks=2), self.today + timedelta(weeks=3)],
+        )
+        # A window starting mid-week jumps to the next meeting
+        self.assertEqual(
+            list(weekly.occurrence_dates(self.today + timedelta(days=1), self.today + timedelta(weeks=2))),
+            [self.today + timedelta(weeks=2)],
+        )
+        single = self.create_class(self.today)
+        self.assertEqual(list(single.occurrence_dates(self.today + timedelta(days=1))), [])
+
+    def test_occurrence_rows(self):
+        weekly = self.create_class(self.today, recurrence='weekly', repeat_until=self.today + timedelta(weeks=2))
+        ClassCancellation.objects.create(class_schedule=weekly, date=self.today + timedelta(weeks=1))
+        fields = ['id', 'date', 'recurrence', 'repeat_until']
+        (rows,) = ClassSchedule.objects.occurrence_rows(fields, self.today, self.today + timedelta(weeks=4))
+        self.assertEqual([row[1] for row in rows], [self.today, self.today + timedelta(weeks=2)])
+
+    def test_cancelled_occurrences_are_not_listed(self):
+        tomorrow = self.today + timedelta(days=1)
+        single = self.create_class(self.today)
+        weekly = self.create_class(self.today, '10:00', recurrence='weekly', repeat_until=self.today + timedelta(weeks=2))
+        later = self.create_class(tomorrow)
+        self.cancel(single, self.today)
+        self.cancel(weekly, self.today)
+
+        self.assertEqual(self.listed_ids('/api/classes/today/'), [])
+        self.assertEqual(self.listed_ids('/api/classes/', date=self.today.isoformat()), [])
+        self.assertEqual(
+            self.listed_ids('/api/classes/upcoming/', date_to=(self.today + timedelta(weeks=1)).isoformat()),
+            [later.id, weekly.id],
+        )
+        timetable = self.client.get('/api/classes/timetable/').json()
+        self.assertEqual(timetable['today'], [])
+
+    def test_cancelled_occurrences_do_not_alarm(self):
+        now = timezone.now().replace(second=0, microsecond=0)
+        starts_at = timezone.localtime(now + timedelta(minutes=DEFAULT_ALARM_MINUTES))
+        single = self.create_class(starts_at.date(), starts_at.time())
+        weekly = self.create_class(
+            starts_at.date() - timedelta(weeks=1), starts_at.time(),
+            recurrence='weekly', repeat_until=starts_at.date() + timedelta(weeks=1),
+        )
+        overriding = create_user('override@giki.edu.pk')
+        for class_schedule in (single, weekly):
+            AlarmSettings.objects.create(user=overriding, class_schedule=class_schedule, alarm_minutes_before=15)
+            ClassCancellation.objects.create(class_schedule=class_schedule, date=starts_at.date())
+
+        self.assertEqual(NotificationService.check_and_send_alarms(now + timedelta(minutes=5)), [])
+        self.assertFalse(NotificationLog.objects.exists())
+
+    def test_recurring_overrides_alarm_per_occurrence(self):
+        now = timezone.now().replace(second=0, microsecond=0)
+        starts_at = timezone.localtime(now + timedelta(minutes=15))
+        weekly = self.create_class(
+            starts_at.date() - timedelta(weeks=1), starts_at.time(),
+            recurrence='weekly', repeat_until=starts_at.date() + timedelta(weeks=1),
+        )
+        AlarmSettings.objects.create(user=self.student, class_schedule=weekly, alarm_minutes_before=15)
+        due = NotificationService.get_due_alarms(now - timedelta(hours=1), now)
+        self.assertEqual([(alarm.user_id, alarm.class_schedule.date) for alarm in due], [(self.student.id, starts_at.date())])
+
+
+@override_settings(**TEST_SETTINGS)
+class ColumnarParityTests(TestCase):
+    """The columnar list plan renders the same bytes as ClassScheduleListSerializer."""
+
+    def test_list_columns_match_serializer(self):
+        cr = create_user('cr@giki.edu.pk', role='cr')
+        classes = create_classes(cr, 3)
+        ClassSchedule.objects.filter(pk=classes[0].pk).update(
+            recurrence='weekly',
+            repeat_until=classes[0].date + timedelta(weeks=4),
+            note='Bring "notes" \\ ünïcode \u2028 and a tab\t',
+        )
+        queryset = ClassSchedule.objects.for_list().order_by('date', 'time', 'id')
+        for zone in ('UTC', 'Asia/Karachi'):
+            with timezone.override(zone):
+                expected = JSONRenderer().render(ClassScheduleListSerializer(queryset, many=True).data)
+                rows = CLASS_SCHEDULE_LIST_COLUMNS.rows(queryset)
+                self.assertEqual(CLASS_SCHEDULE_LIST_COLUMNS.render(rows), expected)
+
+
+@override_settings(**TEST_SETTINGS)
+class AttachmentVariantTests(TestCase):
+    """Thumbnails and previews are served through the authenticated download view."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+
+        image = BytesIO()
+        Image.new('RGB', (600, 400), (200, 30, 30)).save(image, 'PNG')
+        class_schedule = create_classes(self.cr, 1)[0]
+        self.attachment = AttachmentService.attach(class_schedule, ContentFile(image.getvalue(), name='board.png'), 'board.png')
+        self.url = f'/api/classes/attachments/{self.attachment.pk}/download/'
+
+    def test_variant_before_and_after_previews(self):
+        self.assertEqual(self.client.get(self.url, {'variant': 'thumbnail'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'variant': 'original'}).status_code, 400)
+
+        PreviewService.generate(self.attachment.blob_id)
+        data = self.client.get(f'/api/classes/attachments/{self.attachment.pk}/').json()
+        self.assertTrue(data['thumbnail_url'].endswith(self.url + '?variant=thumbnail'))
+        self.assertTrue(data['preview_url'].endswith(self.url + '?variant=preview'))
+
+        response = self.client.get(data['thumbnail_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).format, 'WEBP')
+
+        revalidated = self.client.get(data['thumbnail_url'], HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertNotEqual(self.client.get(data['preview_url'])['ETag'], response['ETag'])
+
+    def test_variant_requires_authentication(self):
+        PreviewService.generate(self.attachment.blob_id)
+        self.assertEqual(APIClient().get(self.url, {'variant': 'thumbnail'}).status_code, 401)
+
+
+@override_settings(**TEST_SETTINGS)
+class AttachmentBlobTests(TestCase):
+    """Identical attachment content is stored once and deleted with its last reference."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.classes = create_classes(self.cr, 2)
+
+    def attach(self, class_schedule, name):
+        return AttachmentService.attach(class_schedule, ContentFile(b'%PDF-1.4 lecture notes', name=name), name)
+
+    def stored_files(self):
+        return [path for path in Path(settings.MEDIA_ROOT).rglob('*') if path.is_file()]
+
+    def test_identical_content_is_stored_once(self):
+        first = self.attach(self.classes[0], 'notes.pdf')
+        second = self.attach(self.classes[1], 'copy.pdf')
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 2)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_deleting_attachments_releases_their_blob(self):
+        first = self.attach(self.classes[0], 'notes.pdf')
+        self.attach(self.classes[1], 'copy.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        # Deleting the class deletes its attachment and the last reference
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classes[1].delete()
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+
+@override_settings(**TEST_SETTINGS, SENDFILE_BACKEND='')
+class AttachmentDownloadTests(TestCase):
+    """Downloads honour Range and conditional requests, or hand the bytes to the front server."""
+
+    content = bytes(range(256)) * 8
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        cr = create_user('cr@giki.edu.pk', role='cr')
+        class_schedule = create_classes(cr, 1)[0]
+        self.attachment = AttachmentService.attach(class_schedule, ContentFile(self.content, name='notes.pdf'), 'notes.pdf')
+        self.url = f'/api/classes/attachments/{self.attachment.pk}/download/'
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('student@giki.edu.pk'))
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.attachment.blob.sha256}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    @override_settings(SENDFILE_BACKEND='nginx', SENDFILE_URL_PREFIX='/protected-media/')
+    def test_nginx_offload(self):
+        response = self.client.get(self.url, {'download': 1})
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.attachment.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+
+
+@override_settings(**TEST_SETTINGS)
+class UploadTests(TestCase):
+    """Chunked uploads resume from the stored offset and only touch files once they commit."""
+
+    content = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+    def setUp(self):
+        for setting in ('MEDIA_ROOT', 'ATTACHMENT_UPLOAD_DIR'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            override = override_settings(**{setting: directory.name})
+            override.enable()
+            self.addCleanup(override.disable)
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.client = APIClient()
+        self.client.force_authenticate(self.cr)
+        class_schedule = create_classes(self.cr, 1)[0]
+        response = self.client.post(
+            f'/api/classes/{class_schedule.pk}/uploads/',
+            {'original_filename': 'notes.pdf', 'file_size': len(self.content)},
+            format='json',
+        )
+        self.upload = AttachmentUpload.objects.get(pk=response.json()['id'])
+        self.url = f'/api/classes/uploads/{self.upload.pk}/'
+
+    def send(self, offset, chunk):
+        return self.client.patch(
+            self.url, chunk, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunks_become_an_attachment(self):
+        middle = len(self.content) // 2
+        self.assertEqual(self.send(0, self.content[:middle])['Upload-Offset'], str(middle))
+        self.assertEqual(self.client.post(self.url + 'finalize/').status_code, 409)
+        self.send(middle, self.content[middle:])
+
+        part_path = UploadService.part_path(self.upload)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url + 'finalize/')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(part_path.exists())
+        attachment = ClassAttachment.objects.get(pk=response.json()['id'])
+        with attachment.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_resume_from_reported_offset_after_dropped_connection(self):
+        # The connection drops ten bytes into a chunk that declared them all
+        UploadService.append(self.upload, 0, BytesIO(self.content[:10]), len(self.content))
+        offset = int(self.client.get(self.url)['Upload-Offset'])
+        self.assertEqual(offset, 10)
+        self.assertEqual(self.send(offset, self.content[offset:]).status_code, 200)
+        self.upload.refresh_from_db()
+        self.assertTrue(self.upload.is_complete)
+        self.assertEqual(UploadService.part_path(self.upload).read_bytes(), self.content)
+
+    def test_chunk_at_wrong_offset_conflicts(self):
+        self.send(0, self.content[:10])
+        response = self.send(20, self.content[20:30])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 10)
+        # A stale client repeating a chunk that already landed cannot move the upload on
+        self.assertEqual(self.send(0, self.content[:10]).status_code, 409)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.received, 10)
+
+    def test_rolled_back_finalize_leaves_files_alone(self):
+        self.send(0, self.content)
+        self.upload.refresh_from_db()
+        part_path = UploadService.part_path(self.upload)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                UploadService.finalize(self.upload)
+                raise RuntimeError('rolled back')
+        self.assertEqual(callbacks, [])
+        self.assertTrue(part_path.exists())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(any(Path(settings.MEDIA_ROOT).rglob('*.pdf')))
+
+
+@override_settings(**TEST_SETTINGS)
+class SyncTests(TestCase):
+    """Delta syncs send changes and tombstones since the token, and reject tokens the server did not issue."""
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.student = create_user('student@giki.edu.pk')
+        self.classes = create_classes(self.cr, 3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def sync(self, token=None):
+        response = self.client.get('/api/classes/sync/', {'token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_delta(self):
+        full = self.sync()
+        self.assertTrue(full['full'])
+        self.assertEqual(len(full['classes']), 3)
+
+        delta = self.sync(full['token'])
+        self.assertFalse(delta['full'])
+
+        deleted = self.classes[0].pk
+        self.classes[0].delete()
+        delta = self.sync(full['token'])
+        self.assertEqual(delta['deleted']['class'], [deleted])
+
+    def test_alarm_tombstones_only_reach_their_owner(self):
+        token = self.sync()['token']
+        other = create_user('other@giki.edu.pk')
+        own = AlarmSettings.objects.create(user=self.student, class_schedule=self.classes[0])
+        AlarmSettings.objects.create(user=other, class_schedule=self.classes[0]).delete()
+        own_id = own.pk
+        own.delete()
+        self.assertEqual(self.sync(token)['deleted']['alarm'], [own_id])
+
+    def test_expired_token_gets_full_sync(self):
+        expired = (timezone.now() - timedelta(days=31)).isoformat()
+        self.classes[0].delete()
+        changes = self.sync(expired)
+        self.assertTrue(changes['full'])
+        self.assertEqual(changes['deleted']['class'], [])
+
+    def test_invalid_tokens_are_rejected(self):
+        for token in ('yesterday', '2026-01-01T00:00:00'):
+            response = self.client.get('/api/classes/sync/', {'token': token})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('token', response.json())
+
+
+def alarmed_emails():
+    """Return the email of each alarm notification's recipient, sorted."""
+    return sorted(NotificationLog.objects.filter(notification_type='alarm').values_list('user__email', flat=True))
+
+
+@override_settings(**TEST_SETTINGS)
+class AlarmDeliveryTests(TestCase):
+    """Each alarm is delivered once, however many checks see it."""
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.now = timezone.now().replace(second=0, microsecond=0)
+        starts_at = timezone.localtime(self.now + timedelta(minutes=20))
+        self.class_schedule = ClassSchedule.objects.create(
+            created_by=self.cr, subject='se221', venue='acb-lh1', date=starts_at.date(), time=starts_at.time()
+        )
+        self.students = [create_user(f'student{i}@giki.edu.pk') for i in range(3)]
+        for student in self.students:
+            AlarmSettings.objects.create(user=student, class_schedule=self.class_schedule, alarm_minutes_before=20)
+
+    def test_repeated_checks_send_once(self):
+        sent = NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual([(alarm['class'], alarm['recipients']) for alarm in sent], [('SE221', 3)])
+        self.assertEqual(NotificationService.check_and_send_alarms(self.now), [])
+        self.assertEqual(NotificationService.check_and_send_alarms(self.now + timedelta(minutes=1)), [])
+        self.assertEqual(alarmed_emails(), sorted(student.email for student in self.students))
+
+    def test_racing_claims_split_alarms(self):
+        due = list(NotificationService.get_due_alarms(self.now - timedelta(hours=1), self.now))
+        self.assertEqual(len(NotificationService.claim_alarms(due)), 3)
+        self.assertEqual(NotificationService.claim_alarms(due), [])
+        self.assertEqual(AlarmDelivery.objects.count(), 3)
+
+    def test_changing_the_offset_after_delivery_does_not_resend(self):
+        NotificationService.check_and_send_alarms(self.now)
+        for alarm_setting in AlarmSettings.objects.filter(class_schedule=self.class_schedule):
+            alarm_setting.alarm_minutes_before = 30
+            alarm_setting.save()
+        self.assertEqual(NotificationService.check_and_send_alarms(self.now), [])
+        self.assertEqual(len(alarmed_emails()), 3)
+
+    def test_moving_the_class_time_after_delivery_does_not_resend(self):
+        NotificationService.check_and_send_alarms(self.now)
+        self.class_schedule.time = timezone.localtime(self.now + timedelta(minutes=25)).time()
+        self.class_schedule.save()
+        self.assertEqual(NotificationService.check_and_send_alarms(self.now + timedelta(minutes=5)), [])
+        self.assertEqual(len(alarmed_emails()), 3)
+
+    def test_changing_the_default_after_delivery_does_not_resend(self):
+        student = create_user('default@giki.edu.pk')
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertIn(student.email, alarmed_emails())
+        AlarmPreference.objects.create(user=student, alarm_minutes_before=30)
+        self.assertEqual(NotificationService.check_and_send_alarms(self.now), [])
+
+    def test_alarms_are_tagged_by_occurrence(self):
+        # The tag the service worker gives the alarm it schedules locally
+        tag = f'alarm-{self.class_schedule.pk}-{self.class_schedule.date.isoformat()}'
+        default = create_user('default@giki.edu.pk')
+        NotificationService.check_and_send_alarms(self.now)
+        for user in [self.students[0], default]:
+            [notification] = NotificationService.get_user_notifications(user)
+            self.assertEqual(notification['tag'], tag)
+
+    def test_purge_keeps_deliveries_the_lookback_can_still_see(self):
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual(NotificationService.purge_deliveries(self.now), 0)
+        self.assertEqual(NotificationService.purge_deliveries(self.now + timedelta(days=2)), 3)
+        self.assertFalse(AlarmDelivery.objects.exists())
+
+
+@override_settings(**TEST_SETTINGS)
+class DefaultAlarmTests(TestCase):
+    """Alarms worked out from defaults and per-class overrides."""
+
+    def setUp(self):
+        self.cr = create_user('cr@giki.edu.pk', role='cr')
+        self.student = create_user('student@giki.edu.pk')
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+    def create_class_starting_in(self, minutes):
+        starts_at = timezone.localtime(self.now + timedelta(minutes=minutes))
+        return ClassSchedule.objects.create(
+            created_by=self.cr, subject='se221', venue='acb-lh1', date=starts_at.date(), time=starts_at.time()
+        )
+
+    def test_class_posted_at_short_notice_still_alarms(self):
+        NotificationService.check_and_send_alarms(self.now - timedelta(minutes=1))
+        class_schedule = self.create_class_starting_in(10)
+        AlarmSettings.objects.create(user=self.student, class_schedule=class_schedule, alarm_minutes_before=15)
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual(alarmed_emails(), [self.student.email])
+
+    def test_defaults_go_to_students_only(self):
+        self.create_class_starting_in(DEFAULT_ALARM_MINUTES)
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual(alarmed_emails(), [self.student.email])
+
+    def test_defaults_follow_preferences_and_overrides(self):
+        class_schedule = self.create_class_starting_in(30)
+        later = create_user('later@giki.edu.pk')
+        AlarmPreference.objects.create(user=later, alarm_minutes_before=30)
+        muted = create_user('muted@giki.edu.pk')
+        AlarmPreference.objects.create(user=muted, is_enabled=False, alarm_minutes_before=30)
+        overriding = create_user('override@giki.edu.pk')
+        AlarmPreference.objects.create(user=overriding, alarm_minutes_before=30)
+        AlarmSettings.objects.create(user=overriding, class_schedule=class_schedule, is_enabled=False)
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual(alarmed_emails(), [later.email])
+        self.assertIn('starts in 30 minutes', NotificationLog.objects.get().message)
+
+    @override_settings(ALARM_DEFAULTS_OPT_IN=True)
+    def test_opt_in_limits_defaults_to_saved_preferences(self):
+        opted_in = create_user('opted@giki.edu.pk')
+        AlarmPreference.objects.create(user=opted_in)
+        self.create_class_starting_in(DEFAULT_ALARM_MINUTES)
+        NotificationService.check_and_send_alarms(self.now)
+        self.assertEqual(alarmed_emails(), [opted_in.email])
+
+    def test_defaults_change_student_inbox_versions(self):
+        version = NotificationService.get_inbox_version(self.student)
+        cr_version = NotificationService.get_inbox_version(self.cr)
+        self.create_class_starting_in(DEFAULT_ALARM_MINUTES)
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationService.check_and_send_alarms(self.now)
+        self.assertNotEqual(NotificationService.get_inbox_version(self.student), version)
+        self.assertEqual(NotificationService.get_inbox_version(self.cr), cr_version)
+
+    def test_query_count_does_not_grow_with_students_or_classes(self):
+        for count in (1, 10):
+            ClassSchedule.objects.all().delete()
+            for i in range(count):
+                create_user(f'student{count}-{i}@giki.edu.pk')
+                self.create_class_starting_in(DEFAULT_ALARM_MINUTES)
+            students = User.objects.filter(role='student').count()
+            # Classes and their cancellations, one-off overrides, the two
+            # INSERT ... SELECTs and their savepoint, and the summary
+            with self.assertNumQueries(8):
+                sent = NotificationService.check_and_send_alarms(self.now)
+            self.assertEqual(sum(alarm['recipients'] for alarm in sent), students * count)
+
+
+@override_settings(**TEST_SETTINGS)
+class DatabaseBrokerTests(TestCase):
+    """Claims respect queue limits and only the current claim settles a task."""
+
+    def setUp(self):
+        self.broker = DatabaseBroker()
+        for _ in range(3):
+            Task.objects.create(name='classes.tasks.check_alarms', queue='alarms', kwargs={})
+
+    def test_claims_respect_queue_limit(self):
+        self.assertEqual(len(self.broker.claim(['alarms'], 4)), 1)
+        self.assertEqual(self.broker.claim(['alarms'], 4), [])
+        self.assertEqual(Task.objects.filter(status='running').count(), 1)
+
+    def test_claim_counts_running_tasks_under_queue_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.broker.claim(['alarms'], 4)
+        statements = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "task_queues"'))
+        count = next(i for i, sql in enumerate(statements) if 'COUNT(' in sql)
+        self.assertLess(lock, count)
+        self.assertIsNotNone(TaskQueue.objects.get(name='alarms').claimed_at)
+
+    def test_stale_claim_does_not_delete_task(self):
+        stale = self.broker.claim(['alarms'], 1)[0]
+        # The lease ran out and another worker claimed the task again
+        Task.objects.filter(pk=stale.pk).update(attempts=stale.attempts + 1)
+        with mock.patch('classes.tasks.NotificationService.check_and_send_alarms') as check_and_send_alarms:
+            self.broker.execute(stale)
+        check_and_send_alarms.assert_called_once()
+        self.assertTrue(Task.objects.filter(pk=stale.pk, status='running').exists())
+
+
+@override_settings(**TEST_SETTINGS)
+class CheckAlarmsViewTests(TestCase):
+    """Only staff and CRs can ask for an alarm check."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_students_are_forbidden(self):
+        self.client.force_authenticate(create_user('student@giki.edu.pk'))
+        response = self.client.post('/api/classes/check-alarms/')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Task.objects.exists())
+
+    def test_crs_queue_a_check(self):
+        self.client.force_authenticate(create_user('cr@giki.edu.pk', role='cr'))
+        response = self.client.post('/api/classes/check-alarms/')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Task.objects.filter(name='classes.tasks.check_alarms').exists())
@@ -0,0 +1,56 @@
+"""
+Timetable service for ClassAlarm system.
+"""
+
+from datetime import date, timedelta
+from .caching import CLASSES_NAMESPACE, alarms_namespace, get_or_build
+from .models import ClassSchedule, AlarmSettings
+from .serializers import ClassScheduleListSerializer
+
+
+# Days after the requested date included under "upcoming"
+TIMETABLE_UPCOMING_DAYS = 7
+
+# Cached timetables only need to outlive a day; changes bump a version instead
+TIMETABLE_TTL = 60 * 60 * 24
+
+
+class TimetableService:
+    """Service for building and caching per-user timetables."""
+    
+    @staticmethod
+    def get_timetable(user, day=None):
+        """
+        Return the user's timetable for day, from the cache when it is current.
+        
+        Cached entries depend on the shared class list and the user's alarms,
+        so a change to either makes them unreachable (see classes.signals).
+        """
+        day = day or date.today()
+        return get_or_build(
+            'timetable',
+            [user.id, day.isoformat()],
+            lambda: TimetableService.build_timetable(user, day),
+            namespaces=[CLASSES_NAMESPACE, alarms_namespace(user.id)],
+            timeout=TIMETABLE_TTL,
+        )
+    
+    @staticmethod
+    def build_timetable(user, day):
+        """Build the user's classes for day and the following week, merged with their alarms."""
+        last_day = day + timedelta(days=TIMETABLE_UPCOMING_DAYS)
+        occurrences = ClassSchedule.objects.for_list().occurrences(day, last_day)
+        alarm_settings = AlarmSettings.for_classes(user, occurrences)
+        
+        timetable = {'date': day.isoformat(), 'today': [], 'upcoming': []}
+        classes = ClassScheduleListSerializer(occurrences, many=True).data
+        for occurrence, data in zip(occurrences, classes):
+            alarm_setting = alarm_settings[occurrence.id]
+            entry = dict(data)
+            entry['alarm'] = {
+                'is_enabled': alarm_setting.is_enabled,
+                'alarm_minutes_before': alarm_setting.alarm_minutes_before,
+                'is_default': alarm_setting.pk is None,
+            }
+            timetable['today' if occurrence.date == day else 'upcoming'].append(entry)
+        return timetable
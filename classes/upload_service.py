@@ -0,0 +1,125 @@
+"""
+Resumable, chunked attachment uploads.
+"""
+
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .attachment_service import AttachmentService
+from .models import AttachmentUpload
+
+
+# Request bodies are copied to disk this many bytes at a time, which bounds
+# the memory an upload takes however large its chunks are
+UPLOAD_BLOCK_SIZE = 64 * 1024
+
+# Uploads left untouched this long are abandoned and purged
+UPLOAD_EXPIRY = timedelta(days=1)
+
+
+class UploadOffsetMismatch(ValueError):
+    """Raised when a chunk does not start where the upload left off."""
+
+
+class UploadIncomplete(ValueError):
+    """Raised when finalizing an upload that is still missing bytes."""
+
+
+class PartFile(File):
+    """A finished part file, which FileSystemStorage moves into place instead of copying."""
+    
+    def temporary_file_path(self):
+        return self.name
+
+
+class UploadService:
+    """Service for resumable attachment uploads: start, append chunks, finalize."""
+    
+    @staticmethod
+    def part_path(upload):
+        """Return where the bytes received so far for upload are kept."""
+        return Path(settings.ATTACHMENT_UPLOAD_DIR) / f"{upload.id}.part"
+    
+    @staticmethod
+    def start(user, class_schedule, original_filename, file_size):
+        """Open an upload session and its empty part file."""
+        upload = AttachmentUpload.objects.create(
+            class_schedule=class_schedule,
+            created_by=user,
+            original_filename=original_filename,
+            file_size=file_size,
+        )
+        part_path = UploadService.part_path(upload)
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path.touch()
+        return upload
+    
+    @staticmethod
+    def append(upload, offset, stream, length):
+        """
+        Write length bytes from stream to upload at offset and return the new offset.
+        
+        The chunk is copied a block at a time. If the connection drops part
+        way, the bytes that did arrive are kept and the client resumes from
+        the offset the upload reports.
+        """
+        if offset != upload.received:
+            raise UploadOffsetMismatch(f"Upload is at offset {upload.received}")
+        
+        written = 0
+        try:
+            with open(UploadService.part_path(upload), 'r+b') as part:
+                part.seek(offset)
+                while written < length:
+                    block = stream.read(min(UPLOAD_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    part.write(block)
+                    written += len(block)
+        finally:
+            # Only advance from the offset this chunk started at, so two
+            # clients racing on one upload cannot both move it on
+            advanced = AttachmentUpload.objects.filter(pk=upload.pk, received=offset).update(
+                received=offset + written, updated_at=timezone.now()
+            )
+        
+        if not advanced:
+            upload.refresh_from_db(fields=['received'])
+            raise UploadOffsetMismatch(f"Upload is at offset {upload.received}")
+        upload.received = offset + written
+        return upload.received
+    
+    @staticmethod
+    def finalize(upload):
+        """Turn a complete upload into a ClassAttachment and close the session."""
+        if not upload.is_complete:
+            raise UploadIncomplete(f"Received {upload.received} of {upload.file_size} bytes")
+        
+        # New content is moved into storage once this commits; content already
+        # stored leaves the part file behind, and deleting the session removes
+        # it after the move (see classes.signals)
+        part_path = UploadService.part_path(upload)
+        with transaction.atomic():
+            with PartFile(open(part_path, 'rb'), name=str(part_path)) as part:
+                blob = AttachmentService.store_later(part, upload.original_filename)
+            attachment = AttachmentService.create_attachment(upload.class_schedule, blob, upload.original_filename)
+            upload.delete()
+        return attachment
+    
+    @staticmethod
+    def abort(upload):
+        """Discard an upload and the bytes received for it."""
+        upload.delete()
+    
+    @staticmethod
+    def purge_expired():
+        """Discard uploads untouched for longer than the expiry; return how many were removed."""
+        expired = AttachmentUpload.objects.filter(updated_at__lt=timezone.now() - UPLOAD_EXPIRY)
+        count = 0
+        for upload in expired.iterator():
+            UploadService.abort(upload)
+            count += 1
+        return count
@@ -8,20 +8,30 @@ urlpatterns = [
     path('today/', views.todays_classes_view, name='today-classes'),
     path('upcoming/', views.upcoming_classes_view, name='upcoming-classes'),
     path('my-classes/', views.my_classes_view, name='my-classes'),
+    path('timetable/', views.timetable_view, name='timetable'),
+    path('sync/', views.sync_view, name='sync'),
+    path('<int:class_schedule_id>/cancel-occurrence/', views.cancel_occurrence_view, name='cancel-occurrence'),
     
     # Class attachments
     path('<int:class_schedule_id>/attachments/', views.ClassAttachmentListCreateView.as_view(), name='attachment-list-create'),
     path('attachments/<int:pk>/', views.ClassAttachmentDetailView.as_view(), name='attachment-detail'),
+    path('attachments/<int:pk>/download/', views.attachment_download_view, name='attachment-download'),
+    path('<int:class_schedule_id>/uploads/', views.start_upload_view, name='upload-start'),
+    path('uploads/<uuid:upload_id>/', views.upload_view, name='upload'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload_view, name='upload-finalize'),
     
     # Alarm settings
     path('alarms/', views.AlarmSettingsListCreateView.as_view(), name='alarm-settings-list-create'),
     path('alarms/<int:pk>/', views.AlarmSettingsDetailView.as_view(), name='alarm-settings-detail'),
+    path('alarms/preference/', views.alarm_preference_view, name='alarm-preference'),
     path('<int:class_schedule_id>/toggle-alarm/', views.toggle_alarm_view, name='toggle-alarm'),
     path('<int:class_schedule_id>/update-alarm-timing/', views.update_alarm_timing_view, name='update-alarm-timing'),
     
     # Notifications
     path('notifications/', views.get_notifications_view, name='get-notifications'),
     path('notifications/clear/', views.clear_notifications_view, name='clear-notifications'),
+    path('notifications/ack/', views.acknowledge_notifications_view, name='acknowledge-notifications'),
+    path('notifications/stream/', views.notifications_stream_view, name='notification-stream'),
     path('<int:class_schedule_id>/test-notification/', views.send_test_notification_view, name='test-notification'),
     path('check-alarms/', views.check_alarms_view, name='check-alarms'),
 ]
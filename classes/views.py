@@ -1,43 +1,104 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from django.db.models import Q
 from django.utils import timezone
 from datetime import date
-from .models import ClassSchedule, ClassAttachment, AlarmSettings
+from itertools import chain
+from operator import itemgetter
+from pathlib import PurePath
+import json
+from .models import (
+    ClassSchedule, ClassAttachment, ClassCancellation, AttachmentUpload, AlarmSettings, AlarmPreference,
+    DEFAULT_ALARM_MINUTES
+)
+from .caching import get_or_build
+from .pagination import ClassScheduleCursorPagination
 from .serializers import (
+    CLASS_SCHEDULE_LIST_COLUMNS,
     ClassScheduleSerializer, 
     ClassScheduleCreateSerializer,
     ClassScheduleListSerializer,
     ClassAttachmentSerializer,
     ClassAttachmentCreateSerializer,
+    AttachmentUploadSerializer,
     AlarmSettingsSerializer,
-    AlarmSettingsUpdateSerializer
+    AlarmSettingsUpdateSerializer,
+    AlarmPreferenceSerializer
 )
 
 
+# Class lists are shared by every student, so cache them briefly; any class
+# change retires the cached pages straight away (see classes.signals)
+CLASS_LIST_CACHE_TTL = 300
+
+# Images made of an attachment (see PreviewService) that ?variant= can fetch
+ATTACHMENT_VARIANTS = ('thumbnail', 'preview')
+
+
 class ClassScheduleListCreateView(generics.ListCreateAPIView):
     """List and create class schedules."""
     
-    def get_queryset(self):
-        """Filter classes based on user role and date."""
-        user = self.request.user
-        
-        # Get query parameters
+    def get_day(self):
+        """Return the day given by ?date= or ?today=, if any."""
         date_filter = self.request.query_params.get('date', None)
         today_only = self.request.query_params.get('today', None)
         
-        queryset = ClassSchedule.objects.all()
-        
-        # CR can see all classes, students see all classes
         if date_filter:
-            queryset = queryset.filter(date=date_filter)
+            try:
+                return date.fromisoformat(date_filter)
+            except ValueError:
+                raise ValidationError({'date': 'Enter a date in YYYY-MM-DD format.'})
         elif today_only:
-            queryset = queryset.filter(date=date.today())
+            return date.today()
+        return None
+    
+    def get_queryset(self):
+        """Filter classes based on user role and date."""
+        day = self.get_day()
+        queryset = ClassSchedule.objects.for_list()
+        
+        # CR can see all classes, students see all classes. A single day is
+        # listed as occurrences so recurring classes show up on their dates
+        if day:
+            return queryset.occurrences(day, day)
         
         return queryset.order_by('date', 'time')
     
+    def list(self, request, *args, **kwargs):
+        """List classes through the shared cache, serialized straight from .values_list() rows."""
+        columns = CLASS_SCHEDULE_LIST_COLUMNS
+        
+        def build():
+            day = self.get_day()
+            if day:
+                rows = chain.from_iterable(ClassSchedule.objects.for_list().occurrence_rows(columns.lookups, day, day))
+                rows = sorted(rows, key=itemgetter(*map(columns.index, ('date', 'time', 'id'))))
+            else:
+                rows = columns.rows(ClassSchedule.objects.for_list().order_by('date', 'time'))
+            
+            page = self.paginate_queryset(rows)
+            return columns.render(
+                page,
+                count=self.paginator.page.paginator.count,
+                next=self.paginator.get_next_link(),
+                previous=self.paginator.get_previous_link(),
+            )
+        
+        content = get_or_build(
+            'class_list_json',
+            [request.build_absolute_uri(), date.today()],
+            build,
+            timeout=CLASS_LIST_CACHE_TTL,
+        )
+        return HttpResponse(content, content_type='application/json')
+    
     def get_serializer_class(self):
         """Use different serializers for list and create."""
         if self.request.method == 'GET':
@@ -59,7 +120,7 @@ class ClassScheduleListCreateView(generics.ListCreateAPIView):
 
 class ClassScheduleDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update, or delete a class schedule."""
-    queryset = ClassSchedule.objects.all()
+    queryset = ClassSchedule.objects.prefetch_related('attachments__blob')
     serializer_class = ClassScheduleSerializer
     
     def get_permissions(self):
@@ -89,7 +150,7 @@ class ClassAttachmentListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         """Get attachments for specific class."""
         class_schedule_id = self.kwargs['class_schedule_id']
-        return ClassAttachment.objects.filter(class_schedule_id=class_schedule_id)
+        return ClassAttachment.objects.filter(class_schedule_id=class_schedule_id).select_related('blob')
     
     def get_serializer_class(self):
         """Use different serializers for list and create."""
@@ -119,7 +180,7 @@ class ClassAttachmentListCreateView(generics.ListCreateAPIView):
 
 class ClassAttachmentDetailView(generics.RetrieveDestroyAPIView):
     """Retrieve or delete a class attachment."""
-    queryset = ClassAttachment.objects.all()
+    queryset = ClassAttachment.objects.select_related('blob')
     serializer_class = ClassAttachmentSerializer
     
     def get_permissions(self):
@@ -137,24 +198,203 @@ class ClassAttachmentDetailView(generics.RetrieveDestroyAPIView):
         instance.delete()
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def attachment_download_view(request, pk):
+    """
+    Download an attachment, inline unless ?download=1 is given, or with
+    ?variant=thumbnail or ?variant=preview the image made of it.
+    
+    Supports Range, If-None-Match and If-Modified-Since; the bytes are sent
+    by the front web server when SENDFILE_BACKEND is set.
+    """
+    from .sendfile import serve_file
+    attachment = get_object_or_404(ClassAttachment.objects.select_related('blob'), pk=pk)
+    as_attachment = bool(request.query_params.get('download'))
+    
+    variant = request.query_params.get('variant')
+    if variant:
+        if variant not in ATTACHMENT_VARIANTS:
+            raise ValidationError({'variant': f"Choose one of: {', '.join(ATTACHMENT_VARIANTS)}."})
+        blob = attachment.blob
+        field_file = getattr(blob, variant) if blob else None
+        if not field_file:
+            return Response({'error': f'No {variant} has been made for this attachment'}, status=404)
+        
+        # Regenerating the images gives them a new timestamp, and so a new ETag
+        previewed_at = blob.previewed_at or attachment.uploaded_at
+        stem = PurePath(attachment.original_filename).stem
+        return serve_file(
+            request,
+            field_file,
+            field_file.size,
+            f'{stem}.{variant}.webp',
+            etag=f'"{blob.sha256}-{variant}-{int(previewed_at.timestamp())}"',
+            last_modified=previewed_at,
+            as_attachment=as_attachment,
+        )
+    
+    # Content-addressed files never change, so their hash is a strong ETag;
+    # an attachment's file is never replaced either, so older ones use the ID
+    if attachment.blob:
+        etag = f'"{attachment.blob.sha256}"'
+    else:
+        etag = f'"attachment-{attachment.pk}-{attachment.file_size}"'
+    
+    return serve_file(
+        request,
+        attachment.file,
+        attachment.file_size,
+        attachment.original_filename,
+        etag=etag,
+        last_modified=attachment.uploaded_at,
+        as_attachment=as_attachment,
+    )
+
+
+@api_view(['POST'])
+def start_upload_view(request, class_schedule_id):
+    """
+    Start a resumable attachment upload, given as {"original_filename": ..., "file_size": ...} (CR only).
+    
+    Send the file as chunks to the returned upload, then finalize it. With
+    the file's "sha256" as well, content the server already holds is
+    attached straight away and returned as {"attachment": ...} instead.
+    """
+    if not request.user.is_cr:
+        return Response(
+            {'error': 'Only CR can add attachments'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    class_schedule = get_object_or_404(ClassSchedule, id=class_schedule_id)
+    serializer = AttachmentUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    upload_data = dict(serializer.validated_data)
+    digest = upload_data.pop('sha256', None)
+    
+    # Every attachment is readable by every user, so knowing a hash gives
+    # away nothing a download would not
+    if digest:
+        from .attachment_service import AttachmentService
+        attachment = AttachmentService.attach_existing(
+            class_schedule, digest, upload_data['file_size'], upload_data['original_filename']
+        )
+        if attachment:
+            serializer = ClassAttachmentSerializer(attachment, context={'request': request})
+            return Response({'attachment': serializer.data}, status=status.HTTP_201_CREATED)
+    
+    from .upload_service import UploadService
+    upload = UploadService.start(request.user, class_schedule, **upload_data)
+    return Response(AttachmentUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+def upload_view(request, upload_id):
+    """
+    Get how far an upload has got, append a chunk to it, or abort it.
+    
+    A chunk is the raw PATCH body, with an Upload-Offset header saying where
+    it starts. After a dropped connection, GET the upload and resume from the
+    offset it reports.
+    """
+    from .upload_service import UploadService, UploadOffsetMismatch
+    upload = get_object_or_404(AttachmentUpload, id=upload_id, created_by=request.user)
+    
+    if request.method == 'DELETE':
+        UploadService.abort(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'Upload-Offset': 'Send the offset the chunk starts at.'})
+        if offset < 0 or offset + length > upload.file_size:
+            raise ValidationError({'Upload-Offset': 'The chunk does not fit in the declared file size.'})
+        
+        try:
+            UploadService.append(upload, offset, request.stream, length)
+        except UploadOffsetMismatch as error:
+            return Response(
+                {'error': str(error), 'offset': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+    
+    response = Response(AttachmentUploadSerializer(upload).data)
+    response['Upload-Offset'] = upload.received
+    return response
+
+
+@api_view(['POST'])
+def finalize_upload_view(request, upload_id):
+    """Turn a fully received upload into an attachment of its class."""
+    from .upload_service import UploadService, UploadIncomplete
+    upload = get_object_or_404(
+        AttachmentUpload.objects.select_related('class_schedule'), id=upload_id, created_by=request.user
+    )
+    
+    try:
+        attachment = UploadService.finalize(upload)
+    except UploadIncomplete as error:
+        return Response(
+            {'error': str(error), 'offset': upload.received},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    serializer = ClassAttachmentSerializer(attachment, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def _date_range(request, earliest=None):
+    """Return the (date_from, date_to) given by the optional ?date_from= and ?date_to= query parameters."""
+    date_range = {}
+    for param in ('date_from', 'date_to'):
+        value = request.query_params.get(param)
+        if value:
+            try:
+                date_range[param] = date.fromisoformat(value)
+            except ValueError:
+                raise ValidationError({param: 'Enter a date in YYYY-MM-DD format.'})
+    
+    date_from = date_range.get('date_from', earliest)
+    if earliest and date_from < earliest:
+        date_from = earliest
+    return date_from, date_range.get('date_to')
+
+
+def _paginated_class_list(request, queryset, date_from=None, date_to=None, per_user=False):
+    """Render one keyset page of class occurrences between the dates as JSON, through the shared cache."""
+    def build():
+        paginator = ClassScheduleCursorPagination()
+        paginator.paginate_queryset(
+            queryset.occurring_between(date_from, date_to), request, date_from=date_from, date_to=date_to
+        )
+        return paginator.get_paginated_content()
+    
+    # The dates are part of the key because "today" moves under the same URL
+    key_parts = [request.build_absolute_uri(), date_from, date_to]
+    if per_user:
+        key_parts.append(request.user.id)
+    content = get_or_build('class_list_json', key_parts, build, timeout=CLASS_LIST_CACHE_TTL)
+    return HttpResponse(content, content_type='application/json')
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def todays_classes_view(request):
     """Get today's classes."""
     today = date.today()
-    classes = ClassSchedule.objects.filter(date=today).order_by('time')
-    serializer = ClassScheduleListSerializer(classes, many=True)
-    return Response(serializer.data)
+    return _paginated_class_list(request, ClassSchedule.objects.for_list(), today, today)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def upcoming_classes_view(request):
-    """Get upcoming classes."""
-    today = date.today()
-    classes = ClassSchedule.objects.filter(date__gte=today).order_by('date', 'time')
-    serializer = ClassScheduleListSerializer(classes, many=True)
-    return Response(serializer.data)
+    """Get upcoming classes, optionally limited to ?date_from= and ?date_to=."""
+    date_from, date_to = _date_range(request, earliest=date.today())
+    return _paginated_class_list(request, ClassSchedule.objects.for_list(), date_from, date_to)
 
 
 @api_view(['GET'])
@@ -167,9 +407,67 @@ def my_classes_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    classes = ClassSchedule.objects.filter(created_by=request.user).order_by('-created_at')
-    serializer = ClassScheduleListSerializer(classes, many=True)
-    return Response(serializer.data)
+    classes = ClassSchedule.objects.for_list().filter(created_by=request.user)
+    date_from, date_to = _date_range(request)
+    return _paginated_class_list(request, classes, date_from, date_to, per_user=True)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def timetable_view(request):
+    """Get the user's classes for ?date= (default today) and the week after, with their alarms."""
+    day = date.today()
+    if request.query_params.get('date'):
+        try:
+            day = date.fromisoformat(request.query_params['date'])
+        except ValueError:
+            raise ValidationError({'date': 'Enter a date in YYYY-MM-DD format.'})
+    
+    from .timetable_service import TimetableService
+    return Response(TimetableService.get_timetable(request.user, day))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_view(request):
+    """
+    Get classes, attachments and the user's alarms changed since ?token=.
+    
+    Omit the token for a full sync; every response carries the token to send
+    next time.
+    """
+    from .sync_service import SyncService, InvalidSyncToken
+    try:
+        changes = SyncService.get_changes(request.user, request.query_params.get('token'))
+    except InvalidSyncToken:
+        raise ValidationError({'token': 'Unknown sync token; sync again without one.'})
+    return Response(changes)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cancel_occurrence_view(request, class_schedule_id):
+    """Cancel one occurrence of a class, given as {"date": "YYYY-MM-DD"} (CR only)."""
+    if not request.user.is_cr:
+        return Response(
+            {'error': 'Only CR can cancel classes'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    class_schedule = get_object_or_404(ClassSchedule, id=class_schedule_id)
+    try:
+        day = date.fromisoformat(str(request.data.get('date', '')))
+    except ValueError:
+        raise ValidationError({'date': 'Enter a date in YYYY-MM-DD format.'})
+    
+    if day not in class_schedule.occurrence_dates(day, day):
+        raise ValidationError({'date': 'The class does not meet on this date.'})
+    
+    ClassCancellation.objects.get_or_create(class_schedule=class_schedule, date=day)
+    
+    # Bump updated_at so the alarm scheduler drops the cancelled occurrence
+    class_schedule.save(update_fields=['updated_at'])
+    return Response({'message': f'{class_schedule.get_subject_display()} on {day} cancelled'})
 
 
 class AlarmSettingsListCreateView(generics.ListCreateAPIView):
@@ -208,15 +506,9 @@ def toggle_alarm_view(request, class_schedule_id):
     
     class_schedule = get_object_or_404(ClassSchedule, id=class_schedule_id)
     
-    alarm_setting, created = AlarmSettings.objects.get_or_create(
-        user=request.user,
-        class_schedule=class_schedule,
-        defaults={'is_enabled': True, 'alarm_minutes_before': 20}
-    )
-    
-    if not created:
-        alarm_setting.is_enabled = not alarm_setting.is_enabled
-        alarm_setting.save()
+    alarm_setting = AlarmSettings.for_classes(request.user, [class_schedule])[class_schedule.id]
+    alarm_setting.is_enabled = not alarm_setting.is_enabled
+    alarm_setting.save_override()
     
     serializer = AlarmSettingsSerializer(alarm_setting)
     return Response(serializer.data)
@@ -229,31 +521,127 @@ def update_alarm_timing_view(request, class_schedule_id):
         return Response({'error': 'Authentication required'}, status=401)
     
     class_schedule = get_object_or_404(ClassSchedule, id=class_schedule_id)
-    alarm_minutes_before = request.data.get('alarm_minutes_before', 20)
-    
-    alarm_setting, created = AlarmSettings.objects.get_or_create(
-        user=request.user,
-        class_schedule=class_schedule,
-        defaults={'is_enabled': True, 'alarm_minutes_before': alarm_minutes_before}
-    )
+    alarm_minutes_before = request.data.get('alarm_minutes_before', DEFAULT_ALARM_MINUTES)
     
-    if not created:
-        alarm_setting.alarm_minutes_before = alarm_minutes_before
-        alarm_setting.save()
+    alarm_setting = AlarmSettings.for_classes(request.user, [class_schedule])[class_schedule.id]
+    alarm_setting.alarm_minutes_before = alarm_minutes_before
+    alarm_setting.save_override()
     
     serializer = AlarmSettingsSerializer(alarm_setting)
     return Response(serializer.data)
 
 
+@api_view(['GET', 'PUT', 'PATCH'])
+@permission_classes([permissions.IsAuthenticated])
+def alarm_preference_view(request):
+    """Get or update the default alarm used for classes without their own setting."""
+    preference = AlarmPreference.for_user(request.user)
+    
+    if request.method == 'GET':
+        return Response(AlarmPreferenceSerializer(preference).data)
+    
+    serializer = AlarmPreferenceSerializer(preference, data=request.data, partial=request.method == 'PATCH')
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return Response(serializer.data)
+
+
+def _notification_cursor(value):
+    """Parse a notification ID cursor, treating anything invalid as the start."""
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return 0
+
+
 @api_view(['GET'])
 def get_notifications_view(request):
-    """Get pending notifications for user."""
+    """
+    Get pending notifications for user.
+    
+    With ?since=ID only notifications newer than ID are returned, oldest
+    first; pass back the returned cursor to fetch just what is new, or the
+    next page while has_more is true. Answers 304 when
+    If-None-Match still matches the inbox ETag. With ?wait=N the request is
+    held for up to N seconds until the inbox changes.
+    """
+    if not request.user.is_authenticated:
+        return Response({'error': 'Authentication required'}, status=401)
+    
+    from .notification_service import NotificationService, NOTIFICATION_LONG_POLL_MAX, NOTIFICATION_INBOX_LIMIT
+    known_etags = parse_etags(request.headers.get('If-None-Match', ''))
+    since = _notification_cursor(request.query_params.get('since'))
+    try:
+        wait = min(max(int(request.query_params.get('wait', 0)), 0), NOTIFICATION_LONG_POLL_MAX)
+    except ValueError:
+        wait = 0
+    
+    notifications, etag = NotificationService.wait_for_notifications(request.user, known_etags, wait, since)
+    if etag in known_etags:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    
+    cursor = notifications[-1]['id'] if notifications else since
+    has_more = len(notifications) == NOTIFICATION_INBOX_LIMIT
+    return Response(
+        {'notifications': notifications, 'cursor': cursor, 'has_more': has_more}, headers={'ETag': etag}
+    )
+
+
+@api_view(['POST'])
+def acknowledge_notifications_view(request):
+    """Mark the notifications listed in {"ids": [...]} as read."""
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=401)
     
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(notification_id, int) for notification_id in ids):
+        raise ValidationError({'ids': 'Send a list of notification IDs.'})
+    
     from .notification_service import NotificationService
-    notifications = NotificationService.get_user_notifications(request.user)
-    return Response({'notifications': notifications})
+    acknowledged = NotificationService.acknowledge_notifications(request.user, ids)
+    return Response({'acknowledged': acknowledged})
+
+
+# Notification streams open in this process
+_open_streams = 0
+
+
+async def notifications_stream_view(request):
+    """
+    Push new notifications to the browser as Server-Sent Events.
+    
+    Needs the ASGI application; under WSGI a stream would hold a worker for
+    its whole lifetime, so the client is told to fall back to polling, as
+    it is once the process holds NOTIFICATION_STREAM_LIMIT streams open.
+    """
+    from .notification_service import NotificationService, NOTIFICATION_STREAM_LIMIT
+    if not isinstance(request, ASGIRequest) or _open_streams >= NOTIFICATION_STREAM_LIMIT:
+        return HttpResponse(status=204)
+    
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=401)
+    
+    # A reconnecting EventSource resumes after the last ID it received
+    since = _notification_cursor(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    
+    async def events():
+        global _open_streams
+        _open_streams += 1
+        try:
+            yield 'retry: 5000\n\n'
+            async for notification in NotificationService.stream_user_notifications(user, since):
+                if notification is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+        finally:
+            _open_streams -= 1
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['POST'])
@@ -262,12 +650,13 @@ def send_test_notification_view(request, class_schedule_id):
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=401)
     
-    from .notification_service import NotificationService
+    from .tasks import send_test_notification
     class_schedule = get_object_or_404(ClassSchedule, id=class_schedule_id)
     
-    NotificationService.send_test_notification(request.user, class_schedule)
+    # Sent by a task worker; it shows up in the inbox like any other notification
+    send_test_notification.enqueue(user_id=request.user.id, class_schedule_id=class_schedule.id)
     
-    return Response({'message': 'Test notification sent successfully'})
+    return Response({'message': 'Test notification queued'}, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['POST'])
@@ -283,13 +672,22 @@ def clear_notifications_view(request):
 
 @api_view(['POST'])
 def check_alarms_view(request):
-    """Manually check and send alarms."""
+    """
+    Ask for a check for due alarms.
+    
+    The check runs on a task worker, and only one waits in the queue at a
+    time, so however many clients ask, the cost stays one scan. The
+    scheduler checks every minute anyway, so only staff and CRs may ask.
+    """
     if not request.user.is_authenticated:
         return Response({'error': 'Authentication required'}, status=401)
     
+    if not (request.user.is_staff or request.user.is_cr):
+        return Response(
+            {'error': 'Only staff or CR can check alarms'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
     from .notification_service import NotificationService
-    notifications_sent = NotificationService.check_and_send_alarms()
-    return Response({
-        'message': f'Sent {len(notifications_sent)} alarm notifications',
-        'notifications': notifications_sent
-    })
+    NotificationService.schedule_alarm_check()
+    return Response({'message': 'Alarm check queued'}, status=status.HTTP_202_ACCEPTED)
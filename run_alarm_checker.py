@@ -1,40 +1,24 @@
 #!/usr/bin/env python
 """
-Simple alarm checker that runs every minute.
+Alarm checker that sends each alarm as soon as it is due.
 Run this in a separate terminal: python run_alarm_checker.py
+
+This is a shortcut for: python manage.py run_alarm_scheduler
 """
 
 import os
 import sys
 import django
-import time
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'classalarm_backend.settings')
 django.setup()
 
-from classes.notification_service import NotificationService
+from django.core.management import call_command
 
 def run_alarm_checker():
-    """Run alarm checker every minute."""
-    print("🔔 Alarm Checker Started - Checking every 60 seconds...")
-    print("Press Ctrl+C to stop")
-    
-    try:
-        while True:
-            notifications_sent = NotificationService.check_and_send_alarms()
-            
-            if notifications_sent:
-                print(f"[{time.strftime('%H:%M:%S')}] Sent {len(notifications_sent)} notifications")
-                for notification in notifications_sent:
-                    print(f"  - {notification['user']}: {notification['class']} ({notification['time']}m)")
-            else:
-                print(f"[{time.strftime('%H:%M:%S')}] No notifications to send")
-            
-            time.sleep(60)  # Wait 60 seconds
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Alarm Checker Stopped")
+    """Run the alarm scheduler until interrupted."""
+    call_command('run_alarm_scheduler', *sys.argv[1:])
 
 if __name__ == '__main__':
     run_alarm_checker()
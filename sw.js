@@ -1,4 +1,5 @@
-const CACHE_NAME = 'classalarm-v1';
+const CACHE_NAME = 'classalarm-v2';
+const API_CACHE_NAME = 'classalarm-api-v1';
 const urlsToCache = [
   '/standalone.html',
   '/manifest.json',
@@ -7,6 +8,18 @@ const urlsToCache = [
   'https://cdn.tailwindcss.com'
 ];
 
+// Class lists and the timetable are served from the cache straight away and
+// refreshed in the background. Only these are cached: downloads, uploads,
+// sync and notifications must always go to the network
+const TIMETABLE_PATH = '/api/classes/timetable/';
+const CACHEABLE_API_PATHS = [
+  '/api/classes/',
+  '/api/classes/today/',
+  '/api/classes/upcoming/',
+  '/api/classes/my-classes/',
+  TIMETABLE_PATH,
+];
+
 self.addEventListener('install', (event) => {
   event.waitUntil(
     caches.open(CACHE_NAME)
@@ -15,6 +28,11 @@ self.addEventListener('install', (event) => {
 });
 
 self.addEventListener('fetch', (event) => {
+  if (isCacheableApiRequest(event.request)) {
+    event.respondWith(staleWhileRevalidate(event));
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then((response) => {
@@ -31,7 +49,7 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cacheName) => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== CACHE_NAME && cacheName !== API_CACHE_NAME) {
             return caches.delete(cacheName);
           }
         })
@@ -39,3 +57,109 @@ self.addEventListener('activate', (event) => {
     })
   );
 });
+
+self.addEventListener('message', (event) => {
+  // Cached responses belong to whoever was signed in; drop them on logout
+  if (event.data && event.data.type === 'clear-api-cache') {
+    event.waitUntil(caches.delete(API_CACHE_NAME));
+  }
+});
+
+self.addEventListener('notificationclick', (event) => {
+  event.notification.close();
+  event.waitUntil(
+    self.clients.matchAll({ type: 'window' }).then((clients) => {
+      if (clients.length > 0) {
+        return clients[0].focus();
+      }
+      return self.clients.openWindow('/');
+    })
+  );
+});
+
+function isCacheableApiRequest(request) {
+  // Partial responses cannot be stored, and the Cache API ignores Range
+  if (request.method !== 'GET' || request.headers.has('Range')) {
+    return false;
+  }
+  return CACHEABLE_API_PATHS.includes(new URL(request.url).pathname);
+}
+
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(API_CACHE_NAME);
+  const cached = await cache.match(event.request);
+  const revalidated = revalidate(event.request, cached, cache);
+
+  let response = cached;
+  if (cached) {
+    event.waitUntil(revalidated.catch(() => {}));
+  } else {
+    response = await revalidated;
+  }
+
+  if (response.ok && new URL(event.request.url).pathname === TIMETABLE_PATH) {
+    event.waitUntil(response.clone().json().then(scheduleAlarms));
+  }
+  return response;
+}
+
+async function revalidate(request, cached, cache) {
+  // Ask the server to answer 304 if our copy is still current
+  const headers = new Headers(request.headers);
+  const cachedETag = cached && cached.headers.get('ETag');
+  if (cachedETag) {
+    headers.set('If-None-Match', cachedETag);
+  }
+
+  const response = await fetch(new Request(request, { headers }));
+  if (response.status === 304 && cached) {
+    return cached;
+  }
+  // Only store complete answers; cache.put rejects a 206
+  if (response.status !== 200) {
+    return response;
+  }
+
+  await cache.put(request, response.clone());
+  if (cached && response.headers.get('ETag') !== cachedETag) {
+    // Let open pages re-render with the fresh copy
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach((client) => client.postMessage({ type: 'api-updated', url: request.url }));
+  }
+  return response;
+}
+
+async function scheduleAlarms(timetable) {
+  const now = Date.now();
+  const alarms = [...timetable.today, ...timetable.upcoming]
+    .filter((classItem) => classItem.alarm && classItem.alarm.is_enabled)
+    .map((classItem) => ({
+      // The same tag the server gives its alarm for this occurrence
+      // (NotificationLog.tag), so the browser shows only one of the two
+      tag: `alarm-${classItem.id}-${classItem.date}`,
+      title: 'ClassAlarm - Class Reminder',
+      body: `${classItem.subject.toUpperCase()} starts in ${classItem.alarm.alarm_minutes_before} minutes!\n📍 ${classItem.venue.toUpperCase()} at ${classItem.time.slice(0, 5)}`,
+      firesAt: new Date(`${classItem.date}T${classItem.time}`).getTime() - classItem.alarm.alarm_minutes_before * 60 * 1000,
+    }))
+    .filter((alarm) => alarm.firesAt > now);
+
+  // Notification Triggers let the browser fire alarms with no page open
+  if (typeof TimestampTrigger !== 'undefined' && 'showTrigger' in Notification.prototype) {
+    const tags = new Set(alarms.map((alarm) => alarm.tag));
+    const pending = await self.registration.getNotifications({ includeTriggered: false });
+    pending
+      .filter((notification) => notification.tag.startsWith('alarm-') && !tags.has(notification.tag))
+      .forEach((notification) => notification.close());
+
+    await Promise.all(alarms.map((alarm) => self.registration.showNotification(alarm.title, {
+      body: alarm.body,
+      tag: alarm.tag,
+      showTrigger: new TimestampTrigger(alarm.firesAt),
+    })));
+    return;
+  }
+
+  // Otherwise open pages keep the timers, since a service worker is stopped when idle
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach((client) => client.postMessage({ type: 'schedule-alarms', alarms }));
+}
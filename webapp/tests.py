@@ -1,3 +1,34 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from classes.models import ClassSchedule
+from classes.tests import TEST_SETTINGS, create_user
 
-# Create your tests here.
+
+@override_settings(**TEST_SETTINGS)
+class CRPanelTests(TestCase):
+    """Classes created from the CR panel are validated like API ones."""
+
+    def setUp(self):
+        self.client.force_login(create_user('cr@giki.edu.pk', role='cr'))
+
+    def post_class(self, repeat_until):
+        today = timezone.localdate()
+        return self.client.post('/cr-panel/', {
+            'subject': 'se221',
+            'venue': 'acb-lh1',
+            'date': today.isoformat(),
+            'time': '09:00',
+            'repeat_until': (today + repeat_until).isoformat(),
+        })
+
+    def test_last_date_before_first_class_is_rejected(self):
+        response = self.post_class(timedelta(days=-7))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'The last date cannot be before the first class.')
+        self.assertFalse(ClassSchedule.objects.exists())
+
+    def test_valid_class_is_created(self):
+        response = self.post_class(timedelta(weeks=4))
+        self.assertRedirects(response, '/cr-panel/', fetch_redirect_response=False)
+        self.assertEqual(ClassSchedule.objects.get().recurrence, 'weekly')
@@ -3,6 +3,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
+from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import get_user_model
 from users.models import CRAssignment
@@ -91,7 +92,7 @@ def dashboard_view(request):
     # Get today's classes
     from datetime import date
     today = date.today()
-    todays_classes = ClassSchedule.objects.filter(date=today).order_by('time')
+    todays_classes = ClassSchedule.objects.occurrences(today, today)
     
     # Get user's created classes if CR
     user_classes = []
@@ -115,6 +116,7 @@ def cr_panel_view(request):
             'error': 'Access denied. CR privileges required.'
         })
     
+    error = None
     if request.method == 'POST':
         # Handle class creation
         subject = request.POST.get('subject')
@@ -122,23 +124,35 @@ def cr_panel_view(request):
         date = request.POST.get('date')
         time = request.POST.get('time')
         note = request.POST.get('note', '')
+        repeat_until = request.POST.get('repeat_until') or None
         
-        ClassSchedule.objects.create(
+        # A last date makes the class repeat weekly until then
+        class_schedule = ClassSchedule(
             created_by=request.user,
             subject=subject,
             venue=venue,
             date=date,
             time=time,
+            recurrence='weekly' if repeat_until else 'none',
+            repeat_until=repeat_until,
             note=note
         )
         
-        return redirect('cr_panel')
+        # Same checks as the API serializers, including ClassSchedule.clean
+        try:
+            class_schedule.full_clean()
+        except ValidationError as e:
+            error = ' '.join(message for messages in e.message_dict.values() for message in messages)
+        else:
+            class_schedule.save()
+            return redirect('cr_panel')
     
     # Get CR's classes
     classes = ClassSchedule.objects.filter(created_by=request.user).order_by('-created_at')
     
     context = {
         'classes': classes,
+        'error': error,
     }
     
     return render(request, 'webapp/cr_panel.html', context)
@@ -149,23 +163,10 @@ def student_panel_view(request):
     """Student panel for viewing classes."""
     from datetime import date
     today = date.today()
-    todays_classes = ClassSchedule.objects.filter(date=today).order_by('time')
+    todays_classes = ClassSchedule.objects.occurrences(today, today)
     
-    # Get alarm settings for each class
-    alarm_settings = {}
-    for class_item in todays_classes:
-        try:
-            alarm_setting = AlarmSettings.objects.get(user=request.user, class_schedule=class_item)
-            alarm_settings[class_item.id] = alarm_setting
-        except AlarmSettings.DoesNotExist:
-            # Create default alarm setting
-            alarm_setting = AlarmSettings.objects.create(
-                user=request.user,
-                class_schedule=class_item,
-                is_enabled=True,
-                alarm_minutes_before=20
-            )
-            alarm_settings[class_item.id] = alarm_setting
+    # Stored overrides plus the user's defaults for every other class
+    alarm_settings = AlarmSettings.for_classes(request.user, todays_classes)
     
     context = {
         'todays_classes': todays_classes,